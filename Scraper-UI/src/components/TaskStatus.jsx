@@ -1,5 +1,6 @@
 import { useEffect, useState } from 'react';
 import axios from 'axios';
+import { applyProgress, describeProgress, isActive, subscribeToTasks } from '../taskEvents';
 
 export default function TaskStatus({ trigger }) {
   const [tasks, setTasks] = useState([]);
@@ -14,10 +15,15 @@ export default function TaskStatus({ trigger }) {
     fetchTasks(); // Fetch on mount or refresh
   }, [trigger]);
 
+  // Live progress for running tasks instead of polling the whole list
+  const activeIds = tasks.filter(isActive).map((task) => task.task_id).join(',');
   useEffect(() => {
-    const interval = setInterval(fetchTasks, 5000); // Poll every 5s
-    return () => clearInterval(interval);
-  }, []);
+    if (!activeIds) return undefined;
+    return subscribeToTasks(activeIds.split(','), (event) => {
+      setTasks((prev) => prev.map((task) => (task.task_id === event.task_id ? applyProgress(task, event) : task)));
+      if (event.status === 'completed' || event.status === 'failed') fetchTasks(); // Pick up the channel
+    });
+  }, [activeIds]);
 
   return (
     <div>
@@ -28,6 +34,7 @@ export default function TaskStatus({ trigger }) {
           <li key={task.task_id}>
             <strong>{task.channel ? task.channel.title : 'Unknown Channel'}</strong> — 
             <span> {task.status.toUpperCase()}</span>
+            {describeProgress(task)}
             {task.status === 'completed' && ` (${task.videos_scraped} videos)`}
             {task.status === 'failed' && (
               <span style={{ color: 'red' }}> ⚠ {task.error_message}</span>
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
+import { applyProgress, describeProgress, isActive, subscribeToTasks } from '../taskEvents';
 
 export default function YouTubeScraper() {
   const [url, setUrl] = useState('');
@@ -54,10 +55,21 @@ export default function YouTubeScraper() {
   useEffect(() => {
     fetchChannels();
     fetchTasks();
-    const interval = setInterval(fetchTasks, 5000); // Poll every 5 seconds
-    return () => clearInterval(interval);
   }, []);
 
+  // Live progress for running tasks instead of polling every 5 seconds
+  const activeIds = tasks.filter(isActive).map((task) => task.task_id).join(',');
+  useEffect(() => {
+    if (!activeIds) return undefined;
+    return subscribeToTasks(activeIds.split(','), (event) => {
+      setTasks((prev) => prev.map((task) => (task.task_id === event.task_id ? applyProgress(task, event) : task)));
+      if (event.status === 'completed' || event.status === 'failed') {
+        fetchTasks();
+        fetchChannels();
+      }
+    });
+  }, [activeIds]);
+
   useEffect(() => {
     if (selectedId) fetchChannelDetail(selectedId);
   }, [selectedId]);
@@ -96,7 +108,8 @@ export default function YouTubeScraper() {
         {tasks.length === 0 && <li>No tasks yet</li>}
         {tasks.map((task) => (
           <li key={task.task_id}>
-            {task.channel.title} — {task.status}
+            {task.channel ? task.channel.title : 'Unknown Channel'} — {task.status}
+            {describeProgress(task)}
             {task.status === 'completed' && ` (${task.videos_scraped} videos)`}
             {task.error_message && <span style={{ color: 'red' }}> ⚠ {task.error_message}</span>}
           </li>
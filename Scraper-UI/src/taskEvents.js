@@ -0,0 +1,38 @@
+const ACTIVE_STATUSES = ['pending', 'processing', 'retrying'];
+const FINAL_STATUSES = ['completed', 'failed', 'unknown'];
+
+export const isActive = (task) => ACTIVE_STATUSES.includes(task.status);
+
+// Open one live progress stream for several tasks and hand each event to
+// onEvent. Browsers allow only a few connections per host, so every task
+// shares this stream instead of opening its own. Returns a function that closes it.
+export function subscribeToTasks(taskIds, onEvent) {
+  const pending = new Set(taskIds);
+  const source = new EventSource(`/api/tasks/events/?ids=${taskIds.map(encodeURIComponent).join(',')}`);
+  source.onmessage = (e) => {
+    const event = JSON.parse(e.data);
+    if (FINAL_STATUSES.includes(event.status)) pending.delete(event.task_id);
+    // The server ends the stream once every task is done; close before EventSource reconnects
+    if (pending.size === 0) source.close();
+    onEvent(event);
+  };
+  return () => source.close();
+}
+
+// Merge a progress event into a task from /api/tasks/
+export function applyProgress(task, event) {
+  return {
+    ...task,
+    status: event.status === 'unknown' ? task.status : event.status,
+    progress: event,
+    videos_scraped: event.videos_scraped ?? task.videos_scraped,
+    error_message: event.error ?? task.error_message,
+  };
+}
+
+export function describeProgress(task) {
+  const progress = task.progress;
+  if (!progress || !isActive(task) || !progress.total) return '';
+  const eta = progress.eta != null ? `, ETA ${Math.round(progress.eta)}s` : '';
+  return ` (${progress.done ?? 0}/${progress.total} videos${eta})`;
+}
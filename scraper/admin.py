@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Channel, Video, ScrapingTask
+from .models import Channel, Video, VideoStatSnapshot, ScrapingTask, Proxy, VideoScrapeAttempt
 
 @admin.register(Channel)
 class ChannelAdmin(admin.ModelAdmin):
@@ -14,8 +14,29 @@ class VideoAdmin(admin.ModelAdmin):
     search_fields = ['title', 'video_id']
     readonly_fields = ['created_at', 'updated_at']
 
+@admin.register(VideoStatSnapshot)
+class VideoStatSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['video', 'view_count', 'like_count', 'comment_count', 'captured_at']
+    list_filter = ['captured_at']
+    search_fields = ['video__title', 'video__video_id']
+    readonly_fields = ['captured_at']
+
 @admin.register(ScrapingTask)
 class ScrapingTaskAdmin(admin.ModelAdmin):
     list_display = ['task_id', 'status', 'channel', 'videos_scraped', 'created_at']
     list_filter = ['status', 'created_at']
     readonly_fields = ['created_at', 'completed_at']
+
+@admin.register(Proxy)
+class ProxyAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'is_active', 'max_concurrency', 'quarantined_until', 'updated_at']
+    list_filter = ['is_active']
+    search_fields = ['url']
+    readonly_fields = ['quarantined_until', 'last_error', 'created_at', 'updated_at']
+
+@admin.register(VideoScrapeAttempt)
+class VideoScrapeAttemptAdmin(admin.ModelAdmin):
+    list_display = ['video_id', 'status', 'error_class', 'http_status', 'attempts', 'last_failed_at']
+    list_filter = ['status', 'error_class']
+    search_fields = ['video_id', 'task_id']
+    readonly_fields = ['first_failed_at', 'last_failed_at']
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.utils.log import get_task_logger
+from .db import in_worker_thread
+from .writer import VideoWriter
+
+
+logger = get_task_logger(__name__)
+
+
+async def scrape_videos_async(task_id, channel, video_urls, limiter, concurrency=100, executor_workers=32,
+                              progress=None, timings=None, checkpoint=None):
+    """
+    Scrape videos concurrently on an asyncio event loop.
+
+    At most min(concurrency, executor_workers) videos are in flight, so a
+    video only asks for a rate limit token once a thread is free to fetch
+    it. The wait for the token, the blocking yt-dlp extraction and the
+    writer all run off the loop, and rows go to a dedicated VideoWriter.
+    """
+    # Imported here to avoid a circular import, tasks.py selects this engine
+    from .tasks import scrape_single_video
+
+    workers = max(1, min(executor_workers, concurrency, len(video_urls)))
+    logger.info(f"Task {task_id}: Starting async video scraping with {len(video_urls)} videos, concurrency: {workers}")
+
+    start = time.time()
+    loop = asyncio.get_running_loop()
+    # One slot per executor thread, so each video waits on the loop until a thread is free to fetch it
+    slots = asyncio.Semaphore(workers)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"async-scrape-{task_id}")
+    writer = VideoWriter(task_id, timings=timings, checkpoint=checkpoint)
+    writer.start()
+    processed = 0
+
+    async def scrape(url):
+        nonlocal processed
+        async with slots:
+            try:
+                return await loop.run_in_executor(
+                    executor, in_worker_thread(scrape_single_video), task_id, channel, url, writer, timings, limiter
+                )
+            except SoftTimeLimitExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Task {task_id}: Error scraping video {url}: {str(e)}")
+                return False
+            finally:
+                processed += 1
+                if progress:
+                    progress.update(processed)
+                if processed % 10 == 0:
+                    elapsed = time.time() - start
+                    logger.info(f"Task {task_id}: Progress: {processed}/{len(video_urls)} videos processed ({processed / elapsed:.2f} videos/s)")
+
+    try:
+        results = await asyncio.gather(*(scrape(url) for url in video_urls))
+    finally:
+        # On a soft time limit or cancellation, extractions not started yet are dropped rather than waited for
+        executor.shutdown(wait=True, cancel_futures=True)
+        # The writer joins its consumer thread, keep that off the event loop
+        written = await loop.run_in_executor(None, writer.close)
+
+    videos_scraped = sum(1 for result in results if result)
+    logger.info(f"Task {task_id}: Stored {written}/{videos_scraped} scraped videos in {time.time() - start:.2f}s")
+    return written
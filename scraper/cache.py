@@ -0,0 +1,219 @@
+import hashlib
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from yt_dlp import YoutubeDL
+from .redis_client import get_redis
+
+
+logger = get_task_logger(__name__)
+
+# ydl.params that change what extract_info returns; anything else (user agent, sleeps) is ignored
+CACHE_KEY_PARAMS = ('extract_flat', 'playlistend', 'playlist_items', 'extractor_args', 'skip_download')
+
+# Heavy keys we never read from a video's info dict
+DROPPED_VIDEO_KEYS = ('formats', 'requested_formats', 'automatic_captions', 'subtitles', 'heatmap', 'thumbnails_raw')
+
+
+class InProcessBackend:
+    """LRU cache held in this process, capped at max_bytes of compressed entries"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.time() + ttl)
+            self._size += len(value)
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        value, _ = self._entries.pop(key)
+        self._size -= len(value)
+
+
+class RedisBackend:
+    """
+    Cache entries in the broker's Redis instance, with LRU eviction over max_bytes.
+
+    A sorted set tracks last access per key and a hash tracks entry sizes. Keys
+    that expire through their TTL stay in the index until eviction reaches them,
+    so the byte count errs on the high side and evicts a little early.
+    """
+
+    PREFIX = 'ytcache:'
+    LRU_KEY = 'ytcache:_lru'
+    SIZES_KEY = 'ytcache:_sizes'
+    BYTES_KEY = 'ytcache:_bytes'
+
+    def __init__(self, max_bytes, client=None):
+        self.max_bytes = max_bytes
+        self.client = client or get_redis()
+
+    def get(self, key):
+        value = self.client.get(self.PREFIX + key)
+        if value is not None:
+            self.client.zadd(self.LRU_KEY, {key: time.time()})
+        return value
+
+    def set(self, key, value, ttl):
+        previous = self.client.hget(self.SIZES_KEY, key)
+        pipe = self.client.pipeline()
+        pipe.set(self.PREFIX + key, value, ex=ttl)
+        pipe.zadd(self.LRU_KEY, {key: time.time()})
+        pipe.hset(self.SIZES_KEY, key, len(value))
+        pipe.incrby(self.BYTES_KEY, len(value) - int(previous or 0))
+        total = pipe.execute()[-1]
+
+        while total > self.max_bytes:
+            oldest = self.client.zpopmin(self.LRU_KEY)
+            if not oldest:
+                break
+            evicted = oldest[0][0]
+            size = self.client.hget(self.SIZES_KEY, evicted)
+            pipe = self.client.pipeline()
+            pipe.delete(self.PREFIX + evicted.decode())
+            pipe.hdel(self.SIZES_KEY, evicted)
+            pipe.decrby(self.BYTES_KEY, int(size or 0))
+            total = pipe.execute()[-1]
+
+
+class ExtractionCache:
+    """Compressed yt-dlp info dicts keyed by URL, extraction kind and extractor options"""
+
+    def __init__(self, backend, ttls):
+        self.backend = backend
+        self.ttls = ttls
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(kind, url, options):
+        payload = json.dumps({'kind': kind, 'url': url, 'options': options}, sort_keys=True, default=str)
+        return f"{kind}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def get(self, kind, url, options):
+        try:
+            value = self.backend.get(self.make_key(kind, url, options))
+        except Exception as e:
+            logger.warning(f"Extraction cache read failed: {str(e)}")
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        self._count('hits' if value is not None else 'misses')
+
+        return json.loads(zlib.decompress(value)) if value is not None else None
+
+    def set(self, kind, url, options, info):
+        value = zlib.compress(json.dumps(info).encode())
+        try:
+            self.backend.set(self.make_key(kind, url, options), value, self.ttls[kind])
+        except Exception as e:
+            logger.warning(f"Extraction cache write failed: {str(e)}")
+
+    def stats(self):
+        """Hit/miss counters for this process, plus cluster-wide totals on Redis"""
+        stats = {'hits': self.hits, 'misses': self.misses}
+        if isinstance(self.backend, RedisBackend):
+            try:
+                totals = self.backend.client.hgetall('ytcache:_stats')
+                stats['total_hits'] = int(totals.get(b'hits', 0))
+                stats['total_misses'] = int(totals.get(b'misses', 0))
+            except Exception as e:
+                logger.warning(f"Extraction cache stats unavailable: {str(e)}")
+        return stats
+
+    def _count(self, field):
+        if isinstance(self.backend, RedisBackend):
+            try:
+                self.backend.client.hincrby('ytcache:_stats', field, 1)
+            except Exception:
+                pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """The process-wide cache configured by EXTRACTION_CACHE_BACKEND, None when disabled"""
+    global _cache
+    backend_name = settings.EXTRACTION_CACHE_BACKEND
+    if not backend_name:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            max_bytes = settings.EXTRACTION_CACHE_MAX_BYTES
+            if backend_name == 'redis':
+                backend = RedisBackend(max_bytes)
+            elif backend_name == 'memory':
+                backend = InProcessBackend(max_bytes)
+            else:
+                raise ValueError(f"Unknown EXTRACTION_CACHE_BACKEND: {backend_name}")
+            _cache = ExtractionCache(backend, settings.EXTRACTION_CACHE_TTLS)
+    return _cache
+
+
+def sanitize_for_cache(kind, info):
+    """JSON-safe copy of an info dict without the parts we never read"""
+    if kind == 'channel':
+        # Unprocessed channel results carry a lazy 'entries' generator, don't consume it
+        info = {key: value for key, value in info.items() if key != 'entries'}
+    elif kind == 'video':
+        info = {key: value for key, value in info.items() if key not in DROPPED_VIDEO_KEYS}
+    return YoutubeDL.sanitize_info(info)
+
+
+def cached_extract_info(ydl, kind, url, fetch=None, **kwargs):
+    """
+    ydl.extract_info(url, download=False) served from the extraction cache when possible.
+
+    On a miss fetch() is called instead, if given, see extractors.fetch_info.
+    """
+    if fetch is None:
+        def fetch():
+            return ydl.extract_info(url, download=False, **kwargs)
+
+    cache = get_extraction_cache()
+    if cache is None:
+        return fetch()
+
+    options = {param: ydl.params.get(param) for param in CACHE_KEY_PARAMS}
+    options.update(kwargs)
+
+    info = cache.get(kind, url, options)
+    if info is not None:
+        return info
+
+    info = fetch()
+    if info:
+        cache.set(kind, url, options, sanitize_for_cache(kind, info))
+    return info
@@ -0,0 +1,141 @@
+import json
+import threading
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from .redis_client import get_redis
+
+
+logger = get_task_logger(__name__)
+
+
+class ScrapeCheckpoint:
+    """
+    Progress of one channel scrape kept in Redis, so a retry or a redelivered
+    task picks up where the last attempt stopped.
+
+    A hash holds the resolved channel and video ID list; two bitmaps indexed
+    by position in that list mark videos stored (done) and videos that failed
+    and were handed to scraper.failures, which owns them from then on: the
+    retry queue, a tombstone or giving up. Later attempts skip both.
+    Every operation degrades to a no-op when Redis is unavailable, costing
+    only the resume.
+    """
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.key = f"scraper:checkpoint:{task_id}"
+        self.done_key = f"{self.key}:done"
+        self.failed_key = f"{self.key}:failed"
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _expire(self, pipe):
+        for key in (self.key, self.done_key, self.failed_key):
+            pipe.expire(key, settings.SCRAPE_CHECKPOINT_TTL)
+
+    def load(self):
+        """Saved state: {'channel': pk, 'videos': [ids], 'newest': id}, each only if reached"""
+        try:
+            state = get_redis().hgetall(self.key)
+        except Exception as e:
+            logger.warning(f"Task {self.task_id}: Checkpoint unavailable: {str(e)}")
+            return {}
+        loaded = {}
+        if b'channel' in state:
+            loaded['channel'] = int(state[b'channel'])
+        if b'videos' in state:
+            loaded['videos'] = json.loads(state[b'videos'])
+            loaded['newest'] = state.get(b'newest', b'').decode() or None
+        return loaded
+
+    def save_channel(self, channel):
+        self._save({'channel': channel.pk})
+
+    def save_videos(self, video_ids, newest_video_id=None):
+        """Record the video list; done/failed bits refer to positions in it"""
+        self._save({'videos': json.dumps(video_ids), 'newest': newest_video_id or ''})
+        with self._lock:
+            self._index = {video_id: i for i, video_id in enumerate(video_ids)}
+
+    def _save(self, fields):
+        try:
+            pipe = get_redis().pipeline()
+            pipe.hset(self.key, mapping=fields)
+            self._expire(pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Task {self.task_id}: Could not save checkpoint: {str(e)}")
+
+    def _video_index(self):
+        """Position of each checkpointed video ID, loaded once per instance"""
+        with self._lock:
+            if self._index is None:
+                self._index = {video_id: i for i, video_id in enumerate(self.load().get('videos') or [])}
+            return self._index
+
+    def _positions(self, video_ids):
+        index = self._video_index()
+        return [index[video_id] for video_id in video_ids if video_id in index]
+
+    def _mark(self, video_ids, set_key, clear_key=None):
+        try:
+            positions = self._positions(video_ids)
+            if not positions:
+                return
+            pipe = get_redis().pipeline()
+            for position in positions:
+                pipe.setbit(set_key, position, 1)
+                if clear_key:
+                    pipe.setbit(clear_key, position, 0)
+            self._expire(pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Task {self.task_id}: Could not update checkpoint: {str(e)}")
+
+    def mark_done(self, video_ids):
+        """Videos written to the database"""
+        self._mark(video_ids, self.done_key, self.failed_key)
+
+    def mark_failed(self, video_ids):
+        """Videos whose failure was recorded, so the retry queue rather than this task tries them again"""
+        self._mark(video_ids, self.failed_key)
+
+    def pending(self, video_ids):
+        """The given videos minus those already done or failed, in order"""
+        try:
+            pipe = get_redis().pipeline()
+            pipe.get(self.done_key)
+            pipe.get(self.failed_key)
+            done, failed = (bitmap or b'' for bitmap in pipe.execute())
+        except Exception as e:
+            logger.warning(f"Task {self.task_id}: Checkpoint unavailable, scraping every video: {str(e)}")
+            return list(video_ids)
+        index = self._video_index() if done or failed else {}
+        return [
+            video_id for video_id in video_ids
+            if video_id not in index or not (is_set(done, index[video_id]) or is_set(failed, index[video_id]))
+        ]
+
+    def counts(self):
+        """(done, failed) so far"""
+        try:
+            pipe = get_redis().pipeline()
+            pipe.bitcount(self.done_key)
+            pipe.bitcount(self.failed_key)
+            done, failed = pipe.execute()
+            return done, failed
+        except Exception as e:
+            logger.warning(f"Task {self.task_id}: Checkpoint unavailable: {str(e)}")
+            return None, None
+
+    def clear(self):
+        try:
+            get_redis().delete(self.key, self.done_key, self.failed_key)
+        except Exception as e:
+            logger.warning(f"Task {self.task_id}: Could not clear checkpoint: {str(e)}")
+
+
+def is_set(bitmap, position):
+    """Bit at position in a Redis bitmap string (most significant bit first)"""
+    byte = position >> 3
+    return byte < len(bitmap) and bool(bitmap[byte] & (0x80 >> (position & 7)))
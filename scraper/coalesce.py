@@ -0,0 +1,69 @@
+import re
+from urllib.parse import urlsplit
+from django.conf import settings
+from .redis_client import get_redis
+
+
+INFLIGHT_PREFIX = 'scraper:inflight:'
+
+# (path pattern, canonical path, case-insensitive). /channel/ IDs are case sensitive, names and handles aren't.
+CHANNEL_PATH_PATTERNS = [
+    (re.compile(r'^/channel/([a-zA-Z0-9_-]+)'), 'channel/{}', False),
+    (re.compile(r'^/@([^/]+)'), '@{}', True),
+    (re.compile(r'^/c/([^/]+)'), 'c/{}', True),
+    (re.compile(r'^/user/([^/]+)'), 'user/{}', True),
+]
+
+# Only delete the in-flight marker if it still belongs to the releasing task
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def normalize_channel_url(url):
+    """
+    Canonical form of a channel URL, so the same channel always maps to one key.
+
+    Handles /channel/, /@handle, /c/ and /user/ URLs on any youtube.com host and
+    drops tabs like /videos, query strings and fragments.
+    """
+    parts = urlsplit(url.strip())
+    # hostname is lowercased and drops any port or user info; subdomains only, not lookalikes such as notyoutube.com
+    host = parts.hostname or ''
+    if host == 'youtube.com' or host.endswith('.youtube.com'):
+        for pattern, template, case_insensitive in CHANNEL_PATH_PATTERNS:
+            match = pattern.match(parts.path)
+            if match:
+                name = match.group(1)
+                return f"https://www.youtube.com/{template.format(name.lower() if case_insensitive else name)}"
+
+    return url.strip().rstrip('/')
+
+
+def claim_channel(channel_url, task_id):
+    """
+    Mark a channel as being scraped by task_id.
+
+    Returns None if the claim succeeded, or the task_id already scraping it.
+    """
+    client = get_redis()
+    key = INFLIGHT_PREFIX + channel_url
+    if client.set(key, task_id, nx=True, ex=settings.SCRAPE_INFLIGHT_TTL):
+        return None
+
+    existing = client.get(key)
+    if existing is None:
+        # The other task released it in the meantime, try once more
+        if client.set(key, task_id, nx=True, ex=settings.SCRAPE_INFLIGHT_TTL):
+            return None
+        existing = client.get(key)
+    return existing.decode() if existing is not None else None
+
+
+def release_channel(channel_url, task_id):
+    """Clear the in-flight marker if task_id still holds it"""
+    client = get_redis()
+    client.eval(_RELEASE_SCRIPT, 1, INFLIGHT_PREFIX + channel_url, task_id)
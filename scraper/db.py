@@ -0,0 +1,27 @@
+from functools import wraps
+from django.db import close_old_connections, connections
+
+
+def release_connections():
+    """Close the calling thread's database connections, which hands them back to the pool if there is one"""
+    for conn in connections.all(initialized_only=True):
+        conn.close()
+
+
+def in_worker_thread(func):
+    """
+    Wrap a callable submitted to a thread pool so its thread never keeps a connection.
+
+    Django manages connections for request and Celery task threads only: a
+    thread pool's threads would each hold one open (or out of the pool)
+    until they are garbage collected. Stale connections are dropped before
+    the call and whatever it opened is released after it.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            release_connections()
+    return wrapper
@@ -0,0 +1,106 @@
+import json
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from .models import ScrapingTask
+from .progress import TERMINAL_STATUSES, progress_channel, progress_key
+
+
+def format_event(payload):
+    """One Server-Sent Events message"""
+    if isinstance(payload, bytes):
+        payload = payload.decode()
+    return f"data: {payload}\n\n"
+
+
+async def initial_events(client, task_ids):
+    """The current state of each task: its latest published event, else its database row"""
+    latest = dict(zip(task_ids, await client.mget([progress_key(task_id) for task_id in task_ids])))
+    missing = [task_id for task_id, payload in latest.items() if payload is None]
+    if missing:
+        # Nothing published yet (or expired), start from the database rows in one query
+        rows = {
+            task.task_id: task
+            async for task in ScrapingTask.objects.filter(task_id__in=missing)
+        }
+        for task_id in missing:
+            task = rows.get(task_id)
+            if task is None:
+                latest[task_id] = json.dumps({'task_id': task_id, 'status': 'unknown'})
+            else:
+                latest[task_id] = json.dumps({
+                    'task_id': task_id,
+                    'status': task.status,
+                    'videos_scraped': task.videos_scraped,
+                    'error': task.error_message,
+                })
+    return [latest[task_id] for task_id in task_ids]
+
+
+async def stream_progress(task_ids):
+    """
+    Yield progress events for several tasks over one Redis pub/sub connection.
+
+    Each event carries its task_id so the client can route it. The stream
+    ends once every task has completed, failed or turned out to be unknown.
+    """
+    client = aioredis.from_url(settings.SCRAPER_REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        # Subscribe before reading the latest events so nothing published in between is lost
+        await pubsub.subscribe(*[progress_channel(task_id) for task_id in task_ids])
+
+        pending = set(task_ids)
+        for payload in await initial_events(client, task_ids):
+            yield format_event(payload)
+            event = json.loads(payload)
+            if event['status'] in TERMINAL_STATUSES or event['status'] == 'unknown':
+                pending.discard(event['task_id'])
+
+        while pending:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=settings.PROGRESS_KEEPALIVE
+            )
+            if message is None:
+                # Comment line, keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+
+            event = json.loads(message['data'])
+            if event.get('task_id') not in pending:
+                continue
+            yield format_event(message['data'])
+            if event.get('status') in TERMINAL_STATUSES:
+                pending.discard(event['task_id'])
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
+
+
+def event_stream_response(task_ids):
+    response = StreamingHttpResponse(stream_progress(task_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def tasks_events(request):
+    """
+    GET /api/tasks/events/?ids=a,b,c - live progress of several tasks as one Server-Sent Events stream
+
+    Browsers allow only a handful of connections per host over HTTP/1.1, so
+    the UI watches all of its running tasks through this one stream instead
+    of opening a stream per task. Needs the ASGI server.
+    """
+    task_ids = list(dict.fromkeys(task_id.strip() for task_id in request.GET.get('ids', '').split(',') if task_id.strip()))
+    if not task_ids:
+        return HttpResponseBadRequest("ids is required, a comma-separated list of task ids")
+    if len(task_ids) > settings.PROGRESS_MAX_STREAM_TASKS:
+        return HttpResponseBadRequest(f"At most {settings.PROGRESS_MAX_STREAM_TASKS} task ids per stream")
+    return event_stream_response(task_ids)
+
+
+async def task_events(request, task_id):
+    """GET /api/tasks/{task_id}/events/ - live progress of one task as Server-Sent Events (needs the ASGI server)"""
+    return event_stream_response([task_id])
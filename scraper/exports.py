@@ -0,0 +1,225 @@
+import csv
+import io
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .models import Video
+
+
+EXPORT_FORMATS = ('ndjson', 'csv', 'parquet')
+
+EXPORT_FIELDS = [
+    'video_id',
+    'channel_id',
+    'title',
+    'description',
+    'duration',
+    'view_count',
+    'like_count',
+    'comment_count',
+    'upload_date',
+    'thumbnail_url',
+    'video_url',
+]
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def export_queryset(channel=None, uploaded_after=None, uploaded_before=None):
+    """Videos to export, in primary key order so the scan follows the table"""
+    queryset = Video.objects.order_by('id')
+    if channel is not None:
+        queryset = queryset.filter(channel_id=channel)
+    if uploaded_after is not None:
+        queryset = queryset.filter(upload_date__gte=uploaded_after)
+    if uploaded_before is not None:
+        queryset = queryset.filter(upload_date__lt=uploaded_before)
+    return queryset
+
+
+def iter_rows(queryset, chunk_size=None):
+    """
+    Stream rows as tuples in EXPORT_FIELDS order.
+
+    iterator() keeps memory flat: on PostgreSQL it reads through a server-side
+    cursor chunk_size rows at a time instead of loading the whole result.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    return queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        record = dict(zip(EXPORT_FIELDS, row))
+        if record['upload_date'] is not None:
+            record['upload_date'] = record['upload_date'].isoformat()
+        yield (json.dumps(record) + '\n').encode()
+
+
+class _Echo:
+    """File-like object handing back whatever csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS).encode()
+    for row in rows:
+        yield writer.writerow(row).encode()
+
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only stream that buffers what pyarrow writes until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(rows, row_group_size=None):
+    """Write rows as Parquet one row group at a time, yielding the bytes of each group"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow installed")
+
+    row_group_size = row_group_size or settings.EXPORT_PARQUET_ROW_GROUP_SIZE
+    schema = pa.schema([
+        ('video_id', pa.string()),
+        ('channel_id', pa.int64()),
+        ('title', pa.string()),
+        ('description', pa.string()),
+        ('duration', pa.int32()),
+        ('view_count', pa.int64()),
+        ('like_count', pa.int64()),
+        ('comment_count', pa.int64()),
+        ('upload_date', pa.timestamp('us', tz='UTC')),
+        ('thumbnail_url', pa.string()),
+        ('video_url', pa.string()),
+    ])
+
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    batch = []
+
+    def write_group(batch):
+        columns = list(zip(*batch))
+        table = pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema,
+        )
+        writer.write_table(table, row_group_size=row_group_size)
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= row_group_size:
+            write_group(batch)
+            batch = []
+            yield sink.drain()
+
+    if batch:
+        write_group(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def check_export_format(file_format):
+    """Raise ValueError before streaming starts if the format can't be produced"""
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{file_format}', use one of {', '.join(EXPORT_FORMATS)}")
+    if file_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow installed")
+
+
+def stream_export(file_format, rows):
+    """Bytes of the export in the requested format"""
+    if file_format == 'ndjson':
+        return stream_ndjson(rows)
+    if file_format == 'csv':
+        return stream_csv(rows)
+    if file_format == 'parquet':
+        return stream_parquet(rows)
+    raise ValueError(f"Unsupported export format: {file_format}")
+
+
+def read_block(chunks, size):
+    """Join pieces of a byte iterator until there are at least `size` bytes, None once it is exhausted"""
+    block = []
+    length = 0
+    for piece in chunks:
+        block.append(piece)
+        length += len(piece)
+        if length >= size:
+            break
+    return b''.join(block) if block else None
+
+
+def iter_export(chunks, block_size=None):
+    """
+    Serve a sync export stream to a WSGI server block by block.
+
+    Under WSGI, Django consumes an async iterator whole before sending
+    anything, so the blocks of aiter_export() are produced here in the
+    request thread instead.
+    """
+    block_size = block_size or settings.EXPORT_STREAM_BLOCK_SIZE
+    chunks = iter(chunks)
+    try:
+        while True:
+            block = read_block(chunks, block_size)
+            if block is None:
+                return
+            yield block
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+async def aiter_export(chunks, block_size=None):
+    """
+    Serve a sync export stream to the ASGI server block by block.
+
+    Under ASGI, Django buffers a sync iterator handed to StreamingHttpResponse
+    into a list before sending anything. Pulling blocks through sync_to_async
+    keeps the stream incremental; the calls are thread sensitive, so the
+    server-side cursor stays on the thread and connection that opened it.
+    """
+    block_size = block_size or settings.EXPORT_STREAM_BLOCK_SIZE
+    chunks = iter(chunks)
+    read = sync_to_async(read_block, thread_sensitive=True)
+    try:
+        while True:
+            block = await read(chunks, block_size)
+            if block is None:
+                return
+            yield block
+    finally:
+        # Closing the generators closes the database cursor, on the same thread
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close, thread_sensitive=True)()
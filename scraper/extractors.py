@@ -0,0 +1,308 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+import yt_dlp
+from yt_dlp.networking import Request
+from celery.signals import worker_process_shutdown
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .cache import cached_extract_info
+from .metrics import VIDEO_EXTRACTIONS_TOTAL, timed_extraction, timed_step
+from .ratelimit import track_response
+
+
+logger = get_task_logger(__name__)
+
+# User agents pool for rotation
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/121.0'
+]
+
+# Extra options per kind of extraction, applied on top of get_ydl_opts()
+PROFILE_OPTS = {
+    'channel': {},
+    'playlist': {
+        'extract_flat': True,  # Don't extract full video info, just metadata
+        # Turn "3 weeks ago" into a rough upload date on flat entries, for the listing tier
+        'extractor_args': {'youtubetab': {'approximate_date': ['']}},
+    },
+    'video': {
+        'writesubtitles': False,
+        'writeautomaticsub': False,
+        'skip_download': True,
+    },
+    # Metadata fast path, see extract_video_info(): no player JS, no client configs,
+    # no DASH/HLS manifests, and the result is not processed into format selections
+    'metadata': {
+        'writesubtitles': False,
+        'writeautomaticsub': False,
+        'skip_download': True,
+        'check_formats': False,
+        'extractor_args': {
+            'youtube': {
+                'player_skip': ['js', 'configs'],
+                'skip': ['dash', 'hls', 'translated_subs'],
+            },
+        },
+    },
+}
+
+# Fields build_video() can't do without; a fast-path result missing one is extracted again in full
+METADATA_REQUIRED_FIELDS = ('title', 'upload_date', 'view_count', 'duration')
+
+def get_ydl_opts(use_proxy=False, proxy_url=None):
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extractaudio': False,
+        'extractvideo': False,
+        'cookiefile': None,  # You can add cookie file path here
+        'user_agent': random.choice(USER_AGENTS),
+        'retries': 3,
+        'fragment_retries': 3,
+        'extractor_retries': 3,
+        'file_access_retries': 3,
+        'http_chunk_size': 10485760,  # 10MB chunks
+        'concurrent_fragment_downloads': 4,
+        'http_headers': {
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-us,en;q=0.5',
+            'Accept-Encoding': 'gzip, deflate',
+            'DNT': '1',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+        }
+    }
+
+    if use_proxy and proxy_url:
+        opts['proxy'] = proxy_url
+
+    return opts
+
+
+class TimedYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL that adds up the time it spends waiting on HTTP, for
+    metrics.timed_extraction, and sends requests through request_proxy and
+    with user_agent when set.
+    """
+
+    http_seconds = 0.0
+    request_proxy = None
+    user_agent = None
+
+    def urlopen(self, req):
+        if isinstance(req, str):
+            req = Request(req)
+        if isinstance(req, Request):
+            if self.request_proxy is not None:
+                # Per-request proxies override the ones the pooled instance was built with
+                req.proxies = {'all': self.request_proxy}
+            if self.user_agent is not None and 'User-Agent' not in req.headers:
+                # The request director copies http_headers once, when it is first built, so changing
+                # params afterwards does nothing; headers set on the request win over the director's.
+                # A User-Agent an extractor chose for the request (e.g. an innertube client) is kept.
+                req.headers['User-Agent'] = self.user_agent
+
+        start = time.perf_counter()
+        try:
+            response = super().urlopen(req)
+        finally:
+            self.http_seconds += time.perf_counter() - start
+
+        # Extractors read the body later, count that as network time too
+        read = response.read
+
+        def timed_read(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return read(*args, **kwargs)
+            finally:
+                self.http_seconds += time.perf_counter() - start
+
+        response.read = timed_read
+        return response
+
+
+class PooledExtractor:
+    """A YoutubeDL instance kept alive across extractions, used by one thread at a time"""
+
+    def __init__(self, profile):
+        opts = get_ydl_opts()
+        opts.update(PROFILE_OPTS[profile])
+        self.profile = profile
+        # Extractors from YDL_EXTRA_EXTRACTORS are tried before yt-dlp's own
+        self.ydl = TimedYoutubeDL(opts, auto_init=False)
+        for path in settings.YDL_EXTRA_EXTRACTORS:
+            self.ydl.add_info_extractor(import_string(path)())
+        self.ydl.add_default_info_extractors()
+        self.uses = 0
+
+    def close(self):
+        try:
+            self.ydl.close()
+        except Exception as e:
+            logger.warning(f"Error closing {self.profile} extractor: {str(e)}")
+
+
+class ExtractorPool:
+    """
+    Process-wide pool of PooledExtractor instances per profile.
+
+    Scrapes run on short-lived ThreadPoolExecutor threads, so a per-thread
+    pool rebuilt every instance for every task and left the old ones to the
+    garbage collector unclosed. Instances here are checked out by one thread,
+    handed back after the extraction and reused by whichever thread asks
+    next. At most YDL_POOL_MAX_IDLE idle instances are kept per profile.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._live = set()
+
+    def checkout(self, profile):
+        with self._lock:
+            idle = self._idle.get(profile)
+            entry = idle.pop() if idle else None
+        if entry is None:
+            # Built outside the lock, other threads keep checking out meanwhile
+            entry = PooledExtractor(profile)
+            with self._lock:
+                self._live.add(entry)
+        entry.uses += 1
+        return entry
+
+    def checkin(self, entry):
+        """Hand an instance back, closing it once it is worn out or the pool is full"""
+        with self._lock:
+            idle = self._idle.setdefault(entry.profile, [])
+            keep = entry in self._live and entry.uses < settings.YDL_POOL_MAX_USES and len(idle) < settings.YDL_POOL_MAX_IDLE
+            if keep:
+                idle.append(entry)
+            else:
+                self._live.discard(entry)
+        if not keep:
+            entry.close()
+
+    def discard(self, entry):
+        """Close an instance that must not be reused"""
+        with self._lock:
+            self._live.discard(entry)
+        entry.close()
+
+    def close_all(self):
+        """Close every instance, idle or checked out"""
+        with self._lock:
+            entries = list(self._live)
+            self._live.clear()
+            self._idle.clear()
+        for entry in entries:
+            entry.close()
+
+
+_pool = ExtractorPool()
+
+
+@contextmanager
+def extractor(profile, proxy=None, **params):
+    """
+    Borrow a YoutubeDL for a profile ('channel', 'playlist' or 'video') from the process pool.
+
+    Instances live for the whole worker process and keep their HTTP session and
+    cookie jar between calls. They are rebuilt after YDL_POOL_MAX_USES uses or
+    as soon as an extraction raises. proxy and extra params only apply to this call.
+    """
+    entry = _pool.checkout(profile)
+    ydl = entry.ydl
+    ydl.request_proxy = proxy
+
+    # Rotate the user agent on every checkout, not just when the instance is built
+    ydl.user_agent = random.choice(USER_AGENTS)
+    saved = {key: ydl.params.get(key) for key in params}
+    ydl.params.update(params)
+
+    try:
+        yield ydl
+    except BaseException:
+        _pool.discard(entry)
+        raise
+    else:
+        ydl.params.update(saved)
+        ydl.request_proxy = None
+        _pool.checkin(entry)
+
+
+def close_all_extractors():
+    """Close every pooled instance, so the next checkout builds fresh ones"""
+    _pool.close_all()
+
+
+@worker_process_shutdown.connect
+def _close_extractors_on_shutdown(**kwargs):
+    close_all_extractors()
+
+
+def missing_metadata(info, fields=METADATA_REQUIRED_FIELDS):
+    """Names of the fields the info dict has no value for"""
+    return [field for field in fields if info.get(field) is None]
+
+
+def fetch_info(ydl, kind, url, step=None, limiter=None, timings=None, pace=True, use_cache=True, **kwargs):
+    """
+    ydl.extract_info(url, download=False) through the extraction cache, paced by the rate limiter.
+
+    Only a cache miss waits for a limiter token and reports how the request
+    went: a hit makes no request, so it neither spends a token nor counts as
+    a success. With pace=False the caller has already taken the token.
+    """
+    step = step or kind
+
+    def fetch():
+        if pace and limiter is not None:
+            with timed_step(f"{step}.throttle", timings):
+                limiter.acquire()
+        with timed_extraction(step, ydl, timings), track_response(limiter):
+            return ydl.extract_info(url, download=False, **kwargs)
+
+    if not use_cache:
+        return fetch()
+    return cached_extract_info(ydl, kind, url, fetch=fetch, **kwargs)
+
+
+def extract_video_info(video_url, proxy=None, timings=None, limiter=None, required=METADATA_REQUIRED_FIELDS,
+                       use_cache=True, pace=True):
+    """
+    Info dict for one video, cheapest extraction first.
+
+    With VIDEO_METADATA_FAST_PATH the 'metadata' profile reads the watch page
+    and player response only, skipping stream formats, signature decoding and
+    format selection. Only when that leaves a required field empty is the
+    video extracted again with the full 'video' profile.
+    """
+    if limiter is not None:
+        limiter = limiter.for_proxy(proxy)
+
+    def extract(ydl, **kwargs):
+        return fetch_info(ydl, 'video', video_url, limiter=limiter, timings=timings, pace=pace, use_cache=use_cache, **kwargs)
+
+    if settings.VIDEO_METADATA_FAST_PATH:
+        with extractor('metadata', proxy=proxy) as ydl:
+            info = extract(ydl, process=False)
+        missing = missing_metadata(info, required) if info else list(required)
+        if not missing:
+            VIDEO_EXTRACTIONS_TOTAL.labels('fast').inc()
+            return info
+        VIDEO_EXTRACTIONS_TOTAL.labels('fallback').inc()
+        logger.info(f"Metadata fast path left {', '.join(missing)} empty for {video_url}, extracting in full")
+    else:
+        VIDEO_EXTRACTIONS_TOTAL.labels('full').inc()
+
+    with extractor('video', proxy=proxy) as ydl:
+        return extract(ydl)
@@ -0,0 +1,153 @@
+import random
+import re
+from datetime import timedelta
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .metrics import VIDEOS_TOTAL
+from .models import VideoScrapeAttempt
+from .ratelimit import is_throttle_error
+
+
+logger = get_task_logger(__name__)
+
+# Messages of failures no retry will fix, by error class
+PERMANENT_MARKERS = (
+    ('private', ('private video',)),
+    ('unavailable', ('video unavailable', 'this video is not available', 'this video does not exist')),
+    ('removed', ('has been removed', 'account associated with this video has been terminated', 'copyright')),
+    ('members_only', ('members-only', 'join this channel')),
+)
+
+# Messages of failures that may well succeed on a later try, checked before PERMANENT_MARKERS
+TRANSIENT_MARKERS = ('timed out', 'temporarily unavailable', 'temporary failure', 'connection reset')
+
+# Failures that need a signed-in session (yt-dlp cookies) rather than a different video: fixing the
+# cookies makes them work, so they are retried until VIDEO_RETRY_MAX_ATTEMPTS and never tombstoned
+LOGIN_MARKERS = (
+    ('age_restricted', ('sign in to confirm your age',)),
+)
+
+HTTP_STATUS_PATTERN = re.compile(r'HTTP Error (\d{3})')
+
+
+class EmptyExtraction(Exception):
+    """yt-dlp returned no info dict for the video"""
+
+
+def http_status(exc):
+    """HTTP status behind a yt-dlp error, following its cause chain, None when there is none"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        status = getattr(exc, 'status', None) or getattr(exc, 'code', None)
+        if isinstance(status, int) and 100 <= status < 600:
+            return status
+        exc_info = getattr(exc, 'exc_info', None)
+        exc = getattr(exc, 'cause', None) or (exc_info[1] if exc_info else None) or exc.__cause__ or exc.__context__
+    return None
+
+
+def classify(exc):
+    """
+    (permanent, error_class, http_status) for a failed video extraction.
+
+    Throttling and transient errors are checked first: YouTube's session
+    rate limit starts with "Video unavailable" too, and must not tombstone.
+    """
+    status = http_status(exc)
+    if status is None:
+        match = HTTP_STATUS_PATTERN.search(str(exc))
+        status = int(match.group(1)) if match else None
+
+    message = str(exc).lower()
+    if status == 429 or is_throttle_error(exc):
+        return False, 'throttled', status
+    if status is not None and status >= 500:
+        return False, 'http_5xx', status
+    if any(marker in message for marker in TRANSIENT_MARKERS):
+        return False, 'transient', status
+    for error_class, markers in LOGIN_MARKERS:
+        if any(marker in message for marker in markers):
+            return False, error_class, status
+
+    for error_class, markers in PERMANENT_MARKERS:
+        if any(marker in message for marker in markers):
+            return True, error_class, status
+    if status in (404, 410):
+        return True, f"http_{status}", status
+
+    if isinstance(exc, EmptyExtraction):
+        return False, 'empty', status
+    # Timeouts, dropped connections, parse errors: worth another try later
+    return False, type(exc).__name__, status
+
+
+def retry_delay(attempts):
+    """Exponential backoff from VIDEO_RETRY_BASE_DELAY, capped, with the upper half jittered"""
+    delay = min(settings.VIDEO_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.VIDEO_RETRY_MAX_DELAY)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def record_failure(task_id, channel, video_id, video_url, exc):
+    """
+    Record a failed video and decide what happens next: permanent failures
+    are tombstoned, transient ones go to the retry queue until
+    VIDEO_RETRY_MAX_ATTEMPTS is used up. Returns the attempt row.
+    """
+    # Imported here, tasks imports this module
+    from .tasks import retry_video_scrape
+
+    permanent, error_class, status = classify(exc)
+    attempt, created = VideoScrapeAttempt.objects.get_or_create(
+        video_id=video_id,
+        defaults={
+            'video_url': video_url,
+            'channel': channel,
+            'task_id': task_id,
+            'status': VideoScrapeAttempt.RETRYING,
+            'error_class': error_class,
+        },
+    )
+    if not created:
+        VideoScrapeAttempt.objects.filter(pk=attempt.pk).update(attempts=F('attempts') + 1)
+        attempt.refresh_from_db(fields=['attempts'])
+
+    attempt.task_id = task_id
+    attempt.error_class = error_class
+    attempt.http_status = status
+    attempt.error_message = str(exc)[:2000]
+    attempt.next_retry_at = None
+    if permanent:
+        attempt.status = VideoScrapeAttempt.TOMBSTONED
+    elif attempt.attempts > settings.VIDEO_RETRY_MAX_ATTEMPTS:
+        attempt.status = VideoScrapeAttempt.GAVE_UP
+    else:
+        attempt.status = VideoScrapeAttempt.RETRYING
+        delay = retry_delay(attempt.attempts)
+        attempt.next_retry_at = timezone.now() + timedelta(seconds=delay)
+    attempt.save(update_fields=[
+        'task_id', 'status', 'error_class', 'http_status', 'error_message', 'next_retry_at', 'last_failed_at',
+    ])
+
+    VIDEOS_TOTAL.labels(attempt.status).inc()
+    if attempt.status == VideoScrapeAttempt.RETRYING:
+        retry_video_scrape.apply_async(args=(video_id,), countdown=delay, queue=settings.VIDEO_RETRY_QUEUE)
+    logger.info(f"Task {task_id}: Video {video_id} failed ({error_class}, attempt {attempt.attempts}), {attempt.status}")
+    return attempt
+
+
+def tombstoned_ids(video_ids):
+    """The given videos that failed permanently, which scrapes skip without a request"""
+    return set(
+        VideoScrapeAttempt.objects.filter(video_id__in=video_ids, status=VideoScrapeAttempt.TOMBSTONED)
+        .values_list('video_id', flat=True)
+    )
+
+
+def resolve_failures(video_ids):
+    """Forget earlier transient failures of videos that have now been stored"""
+    return VideoScrapeAttempt.objects.filter(video_id__in=video_ids).exclude(
+        status=VideoScrapeAttempt.TOMBSTONED
+    ).delete()[0]
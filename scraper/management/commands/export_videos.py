@@ -0,0 +1,36 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from scraper.exports import EXPORT_FORMATS, check_export_format, export_queryset, iter_rows, stream_export
+from scraper.views import parse_query_datetime
+
+
+class Command(BaseCommand):
+    help = "Stream scraped videos to NDJSON, CSV or Parquet with flat memory use"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='file_format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', '-o', help="File to write, stdout if omitted")
+        parser.add_argument('--channel', type=int, help="Channel primary key")
+        parser.add_argument('--after', help="Only videos uploaded on or after this ISO date")
+        parser.add_argument('--before', help="Only videos uploaded before this ISO date")
+        parser.add_argument('--chunk-size', type=int, help="Rows fetched per database round trip")
+
+    def handle(self, *args, **options):
+        file_format = options['file_format']
+        try:
+            check_export_format(file_format)
+            queryset = export_queryset(
+                channel=options['channel'],
+                uploaded_after=parse_query_datetime(options['after']) if options['after'] else None,
+                uploaded_before=parse_query_datetime(options['before']) if options['before'] else None,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in stream_export(file_format, iter_rows(queryset, options['chunk_size'])):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
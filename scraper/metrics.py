@@ -0,0 +1,193 @@
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+from celery.signals import task_postrun, task_prerun, worker_process_shutdown, worker_ready
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server
+
+
+logger = get_task_logger(__name__)
+
+# Whole phases of a channel scrape: channel, listing, videos, total
+PHASE_SECONDS = Histogram(
+    'scraper_phase_seconds',
+    'Time spent in each phase of a channel scrape',
+    ['phase'],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+# Steps inside a phase, e.g. channel.http, listing.sleep, video.parse, video.throttle, db.write
+STEP_SECONDS = Histogram(
+    'scraper_step_seconds',
+    'Time spent in each step of a channel scrape',
+    ['step'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+VIDEOS_TOTAL = Counter('scraper_videos_total', 'Videos handled by scrape tasks', ['result'])
+TASKS_TOTAL = Counter('scraper_tasks_total', 'Channel scrape tasks finished', ['status'])
+# How video info was extracted: fast (metadata only), fallback (fast path then full) or full
+VIDEO_EXTRACTIONS_TOTAL = Counter('scraper_video_extractions_total', 'Video extractions by path', ['path'])
+
+# Adaptive rate limiter (scraper.ratelimit), per egress bucket
+RATE_LIMIT = Gauge(
+    'scraper_rate_limit', 'Current adaptive request rate in requests/sec', ['bucket'],
+    multiprocess_mode='mostrecent',
+)
+THROTTLES_TOTAL = Counter('scraper_throttled_total', 'Responses recognised as throttling', ['bucket'])
+
+
+class TaskTimings:
+    """Per-task totals of the phases and steps timed during one scrape, shared by its worker threads"""
+
+    def __init__(self, initial=None):
+        self._lock = threading.Lock()
+        self._totals = {}
+        if initial:
+            self.merge(initial)
+
+    def add(self, name, seconds, count=1):
+        with self._lock:
+            total = self._totals.setdefault(name, {'seconds': 0.0, 'count': 0})
+            total['seconds'] += seconds
+            total['count'] += count
+
+    def merge(self, other):
+        """Fold in another breakdown, e.g. one returned by a distributed chunk"""
+        for name, total in (other or {}).items():
+            self.add(name, total['seconds'], total['count'])
+
+    def as_dict(self):
+        """JSON-ready breakdown, {name: {'seconds': ..., 'count': ...}}"""
+        with self._lock:
+            return {
+                name: {'seconds': round(total['seconds'], 3), 'count': total['count']}
+                for name, total in sorted(self._totals.items())
+            }
+
+
+def record_step(step, seconds, timings=None):
+    """Record a step whose duration was measured elsewhere, e.g. an awaited rate limit delay"""
+    STEP_SECONDS.labels(step).observe(seconds)
+    if timings is not None:
+        timings.add(step, seconds)
+
+
+@contextmanager
+def timed_step(step, timings=None):
+    """Time a step into STEP_SECONDS and, when given, the task's TaskTimings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_step(step, time.perf_counter() - start, timings)
+
+
+@contextmanager
+def timed_phase(phase, timings=None):
+    """Time a whole phase into PHASE_SECONDS and, when given, the task's TaskTimings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PHASE_SECONDS.labels(phase).observe(elapsed)
+        if timings is not None:
+            timings.add(phase, elapsed)
+
+
+@contextmanager
+def timed_extraction(prefix, ydl, timings=None):
+    """
+    Time a yt-dlp extraction as two steps: prefix.http, the time the instance
+    spent waiting on HTTP (see extractors.TimedYoutubeDL), and prefix.parse,
+    everything else yt-dlp did. Cache hits make no request and are not timed.
+    """
+    http_before = getattr(ydl, 'http_seconds', 0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        http = getattr(ydl, 'http_seconds', 0.0) - http_before
+        record_step(f"{prefix}.http", http, timings)
+        record_step(f"{prefix}.parse", max(elapsed - http, 0.0), timings)
+
+
+def record_phase(phase, seconds, timings=None):
+    """Record a phase whose duration was measured elsewhere"""
+    PHASE_SECONDS.labels(phase).observe(seconds)
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+# Running profilers by Celery task id, see start_profile/dump_slow_profile
+_profiles = {}
+
+
+@task_prerun.connect
+def start_profile(task_id=None, **kwargs):
+    """Profile every task with cProfile when SCRAPE_PROFILE_DIR is set"""
+    if not settings.SCRAPE_PROFILE_DIR:
+        return
+    profiler = cProfile.Profile()
+    _profiles[task_id] = (profiler, time.perf_counter())
+    profiler.enable()
+
+
+@task_postrun.connect
+def dump_slow_profile(task_id=None, task=None, **kwargs):
+    """
+    Keep the profile of a task that ran for at least SCRAPE_PROFILE_MIN_SECONDS.
+
+    cProfile follows the task's own thread only; run a slow scrape with
+    use_parallel=False to see the per-video work in its profile.
+    """
+    entry = _profiles.pop(task_id, None)
+    if entry is None:
+        return
+    profiler, start = entry
+    profiler.disable()
+
+    elapsed = time.perf_counter() - start
+    if elapsed < settings.SCRAPE_PROFILE_MIN_SECONDS:
+        return
+    try:
+        os.makedirs(settings.SCRAPE_PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.SCRAPE_PROFILE_DIR, f"{task.name}-{task_id}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"Task {task_id}: {task.name} took {elapsed:.2f}s, profile written to {path}")
+    except OSError as e:
+        logger.warning(f"Task {task_id}: Could not write profile: {str(e)}")
+
+
+def metrics_registry():
+    """Registry to export: all processes' samples under PROMETHEUS_MULTIPROC_DIR, else this process"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+@worker_ready.connect
+def start_worker_metrics_server(**kwargs):
+    """Serve /metrics from the worker's main process, which sees the pool children via the multiprocess dir"""
+    port = settings.METRICS_WORKER_PORT
+    if not port:
+        return
+    try:
+        start_http_server(port, registry=metrics_registry())
+        logger.info(f"Serving worker metrics on port {port}")
+    except OSError as e:
+        logger.warning(f"Could not serve worker metrics on port {port}: {str(e)}")
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    """Drop an exiting pool child's live gauges from the multiprocess dir"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='latest_video_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
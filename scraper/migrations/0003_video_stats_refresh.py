@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0002_channel_latest_video_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='next_stats_refresh_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='stats_refreshed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='VideoStatSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_count', models.BigIntegerField(blank=True, null=True)),
+                ('like_count', models.BigIntegerField(blank=True, null=True)),
+                ('comment_count', models.BigIntegerField(blank=True, null=True)),
+                ('captured_at', models.DateTimeField(auto_now_add=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stat_snapshots', to='scraper.video')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['video', 'captured_at'], name='scraper_vid_video_i_a954e8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0003_video_stats_refresh'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['-upload_date', '-id'], name='video_upload_date_id'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:44
+
+from django.db import migrations, models
+
+
+def parse_duration(value):
+    """Seconds from the old text column: '213', '213.0', 'H:MM:SS', or '' / 'None'"""
+    value = (value or '').strip()
+    if not value or value == 'None':
+        return None
+    try:
+        return int(round(float(value)))
+    except ValueError:
+        pass
+    try:
+        seconds = 0
+        for part in value.split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+def backfill_duration_seconds(apps, schema_editor):
+    Video = apps.get_model('scraper', 'Video')
+    batch = []
+    for video in Video.objects.exclude(duration='').only('id', 'duration').iterator(chunk_size=2000):
+        video.duration_seconds = parse_duration(video.duration)
+        batch.append(video)
+        if len(batch) >= 2000:
+            Video.objects.bulk_update(batch, ['duration_seconds'])
+            batch = []
+    if batch:
+        Video.objects.bulk_update(batch, ['duration_seconds'])
+
+
+def restore_duration_text(apps, schema_editor):
+    Video = apps.get_model('scraper', 'Video')
+    batch = []
+    for video in Video.objects.exclude(duration_seconds=None).only('id', 'duration_seconds').iterator(chunk_size=2000):
+        video.duration = str(video.duration_seconds)
+        batch.append(video)
+        if len(batch) >= 2000:
+            Video.objects.bulk_update(batch, ['duration'])
+            batch = []
+    if batch:
+        Video.objects.bulk_update(batch, ['duration'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0004_video_upload_date_id_index'),
+    ]
+
+    operations = [
+        # duration: text -> integer seconds, through a backfilled side column
+        migrations.AddField(
+            model_name='video',
+            name='duration_seconds',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_duration_seconds, restore_duration_text),
+        migrations.RemoveField(
+            model_name='video',
+            name='duration',
+        ),
+        migrations.RenameField(
+            model_name='video',
+            old_name='duration_seconds',
+            new_name='duration',
+        ),
+        migrations.AddIndex(
+            model_name='scrapingtask',
+            index=models.Index(fields=['-created_at'], name='task_created_at'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapingtask',
+            index=models.Index(fields=['status', '-created_at'], name='task_status_created_at'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapingtask',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'processing'])), fields=['-created_at'], name='task_active_created_at'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['channel', '-upload_date'], name='video_channel_upload_date'),
+        ),
+    ]
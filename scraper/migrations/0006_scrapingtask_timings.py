@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0005_hot_path_indexes_duration_seconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapingtask',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
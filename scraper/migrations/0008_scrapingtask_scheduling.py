@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0007_proxy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapingtask',
+            name='batch_id',
+            field=models.CharField(blank=True, db_index=True, max_length=36),
+        ),
+        migrations.AddField(
+            model_name='scrapingtask',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapingtask',
+            name='priority',
+            field=models.SmallIntegerField(default=5),
+        ),
+        migrations.AddField(
+            model_name='scrapingtask',
+            name='scrape_options',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='scrapingtask',
+            name='tenant',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='scrapingtask',
+            index=models.Index(condition=models.Q(('dispatched_at__isnull', True), ('status', 'pending'), models.Q(('batch_id', ''), _negated=True)), fields=['priority', 'tenant', 'created_at'], name='task_waiting_priority'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0008_scrapingtask_scheduling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoScrapeAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.CharField(max_length=100, unique=True)),
+                ('video_url', models.URLField()),
+                ('task_id', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('retrying', 'Retrying'), ('tombstoned', 'Tombstoned'), ('gave_up', 'Gave up')], max_length=20)),
+                ('error_class', models.CharField(max_length=100)),
+                ('http_status', models.IntegerField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True)),
+                ('attempts', models.IntegerField(default=1)),
+                ('next_retry_at', models.DateTimeField(blank=True, null=True)),
+                ('first_failed_at', models.DateTimeField(auto_now_add=True)),
+                ('last_failed_at', models.DateTimeField(auto_now=True)),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scrape_attempts', to='scraper.channel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'last_failed_at'], name='attempt_status_failed_at')],
+            },
+        ),
+    ]
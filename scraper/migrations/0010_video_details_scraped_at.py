@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:46
+
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def backfill_details_scraped_at(apps, schema_editor):
+    """Rows holding any field only a full extraction fills had their details scraped"""
+    Video = apps.get_model('scraper', 'Video')
+    Video.objects.filter(
+        Q(like_count__isnull=False) | Q(comment_count__isnull=False) | ~Q(description='')
+    ).update(details_scraped_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0009_videoscrapeattempt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='details_scraped_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_details_scraped_at, migrations.RunPython.noop),
+    ]
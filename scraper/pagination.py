@@ -0,0 +1,113 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class VideoCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (upload_date, id), backed by the video_upload_date_id index.
+
+    DRF's CursorPagination positions its cursor on the first ordering field
+    only and steps over ties with an offset. Upload dates are day-resolution,
+    so a busy channel has large same-day tie groups and pages drift when rows
+    are inserted. This cursor holds both columns instead, and each page starts
+    strictly after the last row of the previous one.
+
+    Videos without an upload date (listing-tier rows YouTube gave no date for)
+    come after all dated ones, newest id first, and their cursor has an empty
+    date. The two groups are read with separate queries, each a plain walk of
+    the index, where NULL dates sit together at one end.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-upload_date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+        position = self.decode_position(self.cursor.position) if self.cursor else None
+
+        parts = [
+            self.dated_rows(queryset.filter(upload_date__isnull=False), position, reverse),
+            self.undated_rows(queryset.filter(upload_date__isnull=True), position, reverse),
+        ]
+        if reverse:
+            parts.reverse()
+
+        # One extra row tells whether there is a page beyond this one
+        limit = self.page_size + 1
+        results = []
+        for part in parts:
+            if part is not None and len(results) < limit:
+                results += part[:limit - len(results)]
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def dated_rows(self, queryset, position, reverse):
+        """Rows with an upload date past the position, None when the position is beyond all of them"""
+        queryset = queryset.order_by(*(('upload_date', 'id') if reverse else self.ordering))
+        if position is None:
+            return queryset
+        upload_date, pk = position
+        if upload_date is None:
+            # Undated rows come last, every dated row is before them
+            return queryset if reverse else None
+        # The plain range condition lets the index scan start at the position
+        if reverse:
+            return queryset.filter(upload_date__gte=upload_date).filter(
+                Q(upload_date__gt=upload_date) | Q(upload_date=upload_date, id__gt=pk)
+            )
+        return queryset.filter(upload_date__lte=upload_date).filter(
+            Q(upload_date__lt=upload_date) | Q(upload_date=upload_date, id__lt=pk)
+        )
+
+    def undated_rows(self, queryset, position, reverse):
+        """Rows without an upload date past the position, None when the position is beyond all of them"""
+        queryset = queryset.order_by('id' if reverse else '-id')
+        if position is None:
+            return queryset
+        upload_date, pk = position
+        if upload_date is not None:
+            return None if reverse else queryset
+        return queryset.filter(id__gt=pk) if reverse else queryset.filter(id__lt=pk)
+
+    def encode_position(self, video):
+        upload_date = video.upload_date.isoformat() if video.upload_date else ''
+        return f"{upload_date}|{video.pk}"
+
+    def decode_position(self, position):
+        try:
+            upload_date, pk = position.split('|')
+            pk = int(pk)
+            if not upload_date:
+                return None, pk
+            upload_date = parse_datetime(upload_date)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if upload_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return upload_date, pk
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.encode_position(self.page[0])))
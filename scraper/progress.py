@@ -0,0 +1,65 @@
+import json
+import time
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from .redis_client import get_redis
+
+
+logger = get_task_logger(__name__)
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def progress_channel(task_id):
+    """Redis pub/sub channel carrying a task's progress events"""
+    return f"scraper:progress:{task_id}"
+
+
+def progress_key(task_id):
+    """Redis key holding a task's latest progress event, for clients that connect mid-run"""
+    return f"scraper:progress-latest:{task_id}"
+
+
+def publish_progress(task_id, status, **fields):
+    """Publish one progress event; progress is best effort and never fails the scrape"""
+    event = {'task_id': task_id, 'status': status, 'updated_at': time.time(), **fields}
+    payload = json.dumps(event)
+    try:
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.set(progress_key(task_id), payload, ex=settings.PROGRESS_TTL)
+        pipe.publish(progress_channel(task_id), payload)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Task {task_id}: Could not publish progress: {str(e)}")
+    return event
+
+
+class ProgressReporter:
+    """Tracks videos done out of total for one scrape and publishes done/total, rate and ETA"""
+
+    def __init__(self, task_id, total, interval=None):
+        self.task_id = task_id
+        self.total = total
+        self.interval = interval if interval is not None else settings.PROGRESS_INTERVAL
+        self.start = time.monotonic()
+        self._last_published = 0.0
+
+    def update(self, done, force=False):
+        """Report videos processed so far, throttled to one event per interval"""
+        now = time.monotonic()
+        if not force and done < self.total and now - self._last_published < self.interval:
+            return None
+        self._last_published = now
+
+        elapsed = max(now - self.start, 1e-6)
+        rate = done / elapsed
+        eta = (self.total - done) / rate if rate > 0 else None
+        return publish_progress(
+            self.task_id, 'processing',
+            phase='videos',
+            done=done,
+            total=self.total,
+            rate=round(rate, 3),
+            eta=round(eta, 1) if eta is not None else None,
+        )
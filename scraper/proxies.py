@@ -0,0 +1,346 @@
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.utils import timezone
+from .models import Proxy
+from .ratelimit import is_throttle_error
+from .redis_client import get_redis
+
+
+logger = get_task_logger(__name__)
+
+# Fragments of errors that point at the proxy itself rather than at YouTube or the video
+PROXY_ERROR_MARKERS = (
+    'proxy',
+    'timed out',
+    'connection refused',
+    'connection reset',
+    'unable to connect',
+    'remote end closed',
+)
+
+# Drop expired leases, then take one if the proxy is below its cap
+_LEASE_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[3])))
+return 1
+"""
+
+# Exponentially weighted success rate and latency, plus the run of consecutive failures
+_RECORD_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'success', 'latency', 'fails')
+local ok = tonumber(ARGV[1])
+local alpha = tonumber(ARGV[3])
+local success = tonumber(state[1]) or 1
+local fails = tonumber(state[3]) or 0
+success = success + alpha * (ok - success)
+if ok == 1 then
+    local latency = tonumber(state[2]) or tonumber(ARGV[2])
+    latency = latency + alpha * (tonumber(ARGV[2]) - latency)
+    redis.call('HSET', KEYS[1], 'latency', latency)
+    fails = 0
+else
+    fails = fails + 1
+end
+redis.call('HSET', KEYS[1], 'success', success, 'fails', fails)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return fails
+"""
+
+
+def is_proxy_error(exc):
+    """True when a failure says something about the proxy's health"""
+    message = str(exc).lower()
+    return is_throttle_error(exc) or any(marker in message for marker in PROXY_ERROR_MARKERS)
+
+
+class ProxyPool:
+    """
+    Health-scored pool over the active Proxy rows.
+
+    Success rate and latency are tracked per proxy in Redis, so every worker
+    picks from the same picture. Proxies are picked at random, weighted by
+    success rate squared over latency. A proxy that fails
+    PROXY_QUARANTINE_AFTER times in a row sits out PROXY_QUARANTINE_SECONDS,
+    doubling each time. Leases cap requests in flight per proxy at its
+    max_concurrency, and a task keeps the proxy it was assigned for all its
+    requests while that proxy has room.
+    """
+
+    def __init__(self):
+        self._proxies = []
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def reload(self):
+        """Pick up Proxy changes on the next call instead of after PROXY_RELOAD_INTERVAL"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def proxies(self):
+        """Active proxies, reloaded from the database every PROXY_RELOAD_INTERVAL seconds"""
+        with self._lock:
+            if not self._loaded_at or time.monotonic() - self._loaded_at > settings.PROXY_RELOAD_INTERVAL:
+                self._proxies = list(Proxy.objects.filter(is_active=True).order_by('id'))
+                self._loaded_at = time.monotonic()
+            return self._proxies
+
+    @staticmethod
+    def _health_key(proxy):
+        return f"scraper:proxy:{proxy.id}"
+
+    @staticmethod
+    def _leases_key(proxy):
+        return f"scraper:proxy-leases:{proxy.id}"
+
+    @staticmethod
+    def _quarantine_key(proxy):
+        return f"scraper:proxy-quarantine:{proxy.id}"
+
+    @staticmethod
+    def _assignment_key(task_id):
+        return f"scraper:proxy-task:{task_id}"
+
+    def health(self):
+        """Success rate, latency, failure run and quarantine of every active proxy"""
+        proxies = self.proxies()
+        client = get_redis()
+        pipe = client.pipeline()
+        for proxy in proxies:
+            pipe.hgetall(self._health_key(proxy))
+            pipe.ttl(self._quarantine_key(proxy))
+            pipe.zcard(self._leases_key(proxy))
+        results = pipe.execute()
+
+        report = []
+        for i, proxy in enumerate(proxies):
+            state, quarantine_ttl, leases = results[i * 3:i * 3 + 3]
+            report.append({
+                'proxy': str(proxy),
+                'success': float(state.get(b'success', 1)),
+                'latency': float(state[b'latency']) if b'latency' in state else None,
+                'fails': int(state.get(b'fails', 0)),
+                'quarantined_for': max(quarantine_ttl, 0),
+                'in_flight': leases,
+                'max_concurrency': proxy.max_concurrency,
+            })
+        return report
+
+    def _weights(self, proxies):
+        """Selection weight per proxy, 0 for quarantined ones"""
+        client = get_redis()
+        pipe = client.pipeline()
+        for proxy in proxies:
+            pipe.hmget(self._health_key(proxy), 'success', 'latency')
+            pipe.exists(self._quarantine_key(proxy))
+        results = pipe.execute()
+
+        weights = []
+        for i in range(len(proxies)):
+            (success, latency), quarantined = results[i * 2], results[i * 2 + 1]
+            if quarantined:
+                weights.append(0.0)
+                continue
+            success = float(success) if success is not None else 1.0
+            latency = float(latency) if latency is not None else settings.PROXY_DEFAULT_LATENCY
+            weights.append(max(success, 0.05) ** 2 / max(latency, 0.05))
+        return weights
+
+    def choose(self, exclude=()):
+        """Pick a proxy by health, None when there is none to use"""
+        proxies = [proxy for proxy in self.proxies() if proxy.id not in exclude]
+        if not proxies:
+            return None
+        try:
+            weights = self._weights(proxies)
+        except Exception as e:
+            logger.warning(f"Proxy health unavailable, picking at random: {str(e)}")
+            return random.choice(proxies)
+        if not any(weights):
+            return None
+        return random.choices(proxies, weights=weights)[0]
+
+    def assign(self, task_id):
+        """The task's sticky proxy, picking and recording one on first use"""
+        if not self.proxies():
+            return None
+        try:
+            client = get_redis()
+            assigned = client.get(self._assignment_key(task_id))
+            if assigned is not None:
+                proxy = self._by_id(int(assigned))
+                if proxy is not None and not client.exists(self._quarantine_key(proxy)):
+                    return proxy
+        except Exception as e:
+            logger.warning(f"Task {task_id}: Proxy assignment unavailable: {str(e)}")
+            return self.choose()
+
+        proxy = self.choose()
+        if proxy is not None:
+            client.set(self._assignment_key(task_id), proxy.id, ex=settings.PROXY_ASSIGNMENT_TTL)
+            logger.info(f"Task {task_id}: Assigned proxy {proxy}")
+        return proxy
+
+    def _by_id(self, proxy_id):
+        return next((proxy for proxy in self.proxies() if proxy.id == proxy_id), None)
+
+    def lease(self, proxy):
+        """Take a slot on the proxy, returns the lease id or None when it is at max_concurrency"""
+        lease_id = uuid.uuid4().hex
+        taken = get_redis().eval(
+            _LEASE_SCRIPT, 1, self._leases_key(proxy),
+            time.time(), proxy.max_concurrency, settings.PROXY_LEASE_TTL, lease_id,
+        )
+        return lease_id if taken else None
+
+    def release(self, proxy, lease_id):
+        try:
+            get_redis().zrem(self._leases_key(proxy), lease_id)
+        except Exception as e:
+            logger.warning(f"Could not release lease on proxy {proxy}: {str(e)}")
+
+    def record(self, proxy, ok, latency=0.0, error=None):
+        """Feed one request's outcome into the proxy's health, quarantining it after a run of failures"""
+        try:
+            client = get_redis()
+            fails = client.eval(
+                _RECORD_SCRIPT, 1, self._health_key(proxy),
+                1 if ok else 0, latency, settings.PROXY_HEALTH_ALPHA, settings.PROXY_HEALTH_TTL,
+            )
+            if not ok and int(fails) >= settings.PROXY_QUARANTINE_AFTER:
+                self.quarantine(proxy, error)
+        except Exception as e:
+            logger.warning(f"Could not record health of proxy {proxy}: {str(e)}")
+
+    def quarantine(self, proxy, error=None):
+        client = get_redis()
+        times = client.hincrby(self._health_key(proxy), 'quarantines', 1)
+        seconds = min(
+            settings.PROXY_QUARANTINE_SECONDS * 2 ** (times - 1),
+            settings.PROXY_QUARANTINE_MAX_SECONDS,
+        )
+        client.set(self._quarantine_key(proxy), 1, ex=int(seconds))
+        client.hset(self._health_key(proxy), 'fails', 0)
+        Proxy.objects.filter(pk=proxy.pk).update(
+            quarantined_until=timezone.now() + timedelta(seconds=seconds),
+            last_error=str(error or '')[:2000],
+        )
+        logger.warning(f"Proxy {proxy} quarantined for {seconds:.0f}s after repeated failures: {error}")
+
+    def quarantine_remaining(self):
+        """Seconds until the first quarantined proxy is back, 0 when one is not quarantined"""
+        proxies = self.proxies()
+        pipe = get_redis().pipeline()
+        for proxy in proxies:
+            pipe.pttl(self._quarantine_key(proxy))
+        return max(min(pipe.execute(), default=0), 0) / 1000
+
+    def _wait_out_quarantine(self, task_id=None):
+        """
+        Every proxy is quarantined: go direct if PROXY_DIRECT_FALLBACK allows it,
+        otherwise wait for the first one back, for up to PROXY_QUARANTINE_WAIT
+        seconds. Returns the proxy to use, None for direct.
+        """
+        if settings.PROXY_DIRECT_FALLBACK:
+            logger.warning(f"Task {task_id}: Every proxy is quarantined, going direct")
+            return None
+        deadline = time.monotonic() + settings.PROXY_QUARANTINE_WAIT
+        while True:
+            remaining = self.quarantine_remaining()
+            if time.monotonic() + remaining > deadline:
+                raise RuntimeError(f"Every proxy is quarantined, the first is back in {remaining:.0f}s")
+            logger.info(f"Task {task_id}: Every proxy is quarantined, waiting {remaining:.1f}s for the first one back")
+            time.sleep(remaining + 0.01)
+            proxy = self.assign(task_id) if task_id else self.choose()
+            if proxy is not None:
+                return proxy
+
+    def acquire(self, task_id=None):
+        """
+        A proxy and lease for one request: the task's own proxy when it has room,
+        otherwise the healthiest other proxy that does. (None, None) means go
+        direct, either because there are no proxies or, with
+        PROXY_DIRECT_FALLBACK, because every one of them is quarantined.
+        """
+        preferred = self.assign(task_id) if task_id else self.choose()
+        if preferred is None and self.proxies():
+            preferred = self._wait_out_quarantine(task_id)
+        if preferred is None:
+            return None, None
+
+        tried = set()
+        proxy = preferred
+        deadline = time.monotonic() + settings.PROXY_LEASE_WAIT
+        while True:
+            try:
+                lease_id = self.lease(proxy)
+            except Exception as e:
+                logger.warning(f"Proxy leases unavailable, using {proxy} without a cap: {str(e)}")
+                return proxy, None
+            if lease_id is not None:
+                return proxy, lease_id
+
+            tried.add(proxy.id)
+            proxy = self.choose(exclude=tried)
+            if proxy is None:
+                # Every proxy is full, wait for a slot on the preferred one
+                if time.monotonic() >= deadline:
+                    raise RuntimeError("All proxies are at max_concurrency")
+                time.sleep(0.1)
+                tried.clear()
+                proxy = preferred
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_proxy_pool():
+    """The process-wide ProxyPool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProxyPool()
+    return _pool
+
+
+def assigned_proxy_url(task_id):
+    """URL of the task's sticky proxy, None when scraping directly"""
+    proxy = get_proxy_pool().assign(task_id)
+    return proxy.url if proxy else None
+
+
+@contextmanager
+def proxied(task_id=None):
+    """
+    Route one extraction through the pool: yields the proxy URL to hand to
+    extractor() (None for a direct request) and records how it went.
+    """
+    pool = get_proxy_pool()
+    proxy, lease_id = pool.acquire(task_id)
+    if proxy is None:
+        yield None
+        return
+
+    start = time.monotonic()
+    try:
+        yield proxy.url
+    except Exception as e:
+        if is_proxy_error(e):
+            pool.record(proxy, False, error=e)
+        raise
+    else:
+        pool.record(proxy, True, time.monotonic() - start)
+    finally:
+        if lease_id is not None:
+            pool.release(proxy, lease_id)
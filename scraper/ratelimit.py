@@ -0,0 +1,365 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from .metrics import RATE_LIMIT, THROTTLES_TOTAL
+from .redis_client import get_redis
+
+
+logger = get_task_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at `rate` tokens per second, holding at most `burst`.
+
+    Callers reserve a token up front and then wait out their own delay, so
+    concurrent workers are released in order at a steady rate. take() only
+    takes a token that is already there and leaves no debt behind, for
+    callers with many requests waiting at once.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def take(self):
+        """
+        Take a token if one is available now and return 0, otherwise take
+        nothing and return how many seconds until one should be.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def refund(self):
+        """Give back a reserved token that will not be used"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def acquire(self):
+        """Block until a token is available, returns the time spent waiting"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def for_proxy(self, proxy):
+        """A fixed rate caps the whole task, whichever proxy a request leaves through"""
+        return self
+
+    def record_success(self):
+        """Fixed rate, nothing to adapt"""
+
+    def record_throttle(self):
+        """Fixed rate, nothing to adapt"""
+
+
+# Fragments of yt-dlp errors that mean YouTube is pushing back rather than the video being broken
+THROTTLE_MARKERS = (
+    'http error 429',
+    'too many requests',
+    'confirm you\'re not a bot',
+    'confirm you’re not a bot',
+    'consent.youtube.com',
+    'unusual traffic',
+    # "This content isn't available, try again later. The current session has been rate-limited by YouTube"
+    'try again later',
+    'rate-limited',
+    'captcha challenge',
+)
+
+
+# Overload rather than throttling: not worth tombstoning or retrying differently, but worth slowing down for
+OVERLOAD_MARKERS = (
+    'http error 503',
+    'service unavailable',
+)
+
+
+def is_throttle_error(exc):
+    """True for 429s, session rate limits, consent interstitials and bot checks"""
+    message = str(exc).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+def is_backoff_error(exc):
+    """True for anything the limiter should slow down for: throttling, or a 503"""
+    message = str(exc).lower()
+    return is_throttle_error(exc) or any(marker in message for marker in OVERLOAD_MARKERS)
+
+
+@contextmanager
+def track_response(limiter):
+    """Report the outcome of the request made inside the block back to the limiter, if any"""
+    if limiter is None:
+        yield
+        return
+    try:
+        yield
+    except Exception as e:
+        if is_backoff_error(e):
+            limiter.record_throttle()
+        raise
+    else:
+        limiter.record_success()
+
+
+def egress_bucket(proxy=None):
+    """Rate limit bucket for requests leaving through a proxy, or directly from RATE_LIMIT_EGRESS"""
+    if proxy:
+        parsed = urlsplit(proxy)
+        # Credentials don't change where requests come from, keep them out of keys and metrics
+        return f"proxy:{parsed.hostname}:{parsed.port}" if parsed.hostname else f"proxy:{proxy}"
+    return f"ip:{settings.RATE_LIMIT_EGRESS}"
+
+
+# Token bucket with the current rate: refill since the last call, take one token, return the wait
+_RESERVE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'rate', 'tokens', 'updated')
+local rate = tonumber(state[1]) or tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local tokens = tonumber(state[2]) or burst
+local updated = tonumber(state[3]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate) - 1
+redis.call('HSET', KEYS[1], 'rate', rate, 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local wait = 0
+if tokens < 0 then wait = -tokens / rate end
+return {tostring(wait), tostring(rate)}
+"""
+
+# Same refill, but only take a token that is there now; otherwise return the wait and leave the bucket alone
+_TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'rate', 'tokens', 'updated')
+local rate = tonumber(state[1]) or tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local tokens = tonumber(state[2]) or burst
+local updated = tonumber(state[3]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'rate', rate, 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {tostring(wait), tostring(rate)}
+"""
+
+# Additive increase: about ARGV[2] requests/sec more for every second of successful requests
+_SUCCESS_SCRIPT = """
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or tonumber(ARGV[1])
+rate = math.min(tonumber(ARGV[3]), rate + tonumber(ARGV[2]) / rate)
+redis.call('HSET', KEYS[1], 'rate', rate)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return tostring(rate)
+"""
+
+# Give back a token reserved but never used, so abandoned reservations don't leave debt behind
+_REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', math.min(tonumber(ARGV[1]), tokens + 1))
+end
+return 1
+"""
+
+# Multiplicative decrease, at most once per cooldown so one burst of 429s counts as one signal
+_THROTTLE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'rate', 'last_cut', 'tokens')
+local rate = tonumber(state[1]) or tonumber(ARGV[1])
+if now - (tonumber(state[2]) or 0) >= tonumber(ARGV[4]) then
+    rate = math.max(tonumber(ARGV[3]), rate * tonumber(ARGV[2]))
+    redis.call('HSET', KEYS[1], 'rate', rate, 'last_cut', now)
+    if (tonumber(state[3]) or 0) > 0 then
+        redis.call('HSET', KEYS[1], 'tokens', 0, 'updated', now)
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return tostring(rate)
+"""
+
+
+class AdaptiveRateLimiter:
+    """
+    AIMD request rate shared by every worker through Redis, one bucket per egress.
+
+    Successful requests raise the rate by about RATE_LIMIT_INCREASE requests/sec
+    per second, up to RATE_LIMIT_MAX; a 429, 503, consent page or bot check
+    multiplies it by RATE_LIMIT_DECREASE, down to RATE_LIMIT_MIN. Drop-in for
+    TokenBucket. While Redis is unreachable the same algorithm runs on a bucket
+    in this process, and Redis is tried again every RATE_LIMIT_REDIS_RETRY seconds.
+    """
+
+    def __init__(self, bucket=None):
+        self.bucket = bucket or egress_bucket()
+        self.key = f"scraper:rate:{self.bucket}"
+        self.rate = float(settings.RATE_LIMIT_INITIAL)
+        self._fallback = None
+        self._redis_retry_at = None
+        self._last_cut = 0.0
+        self._fallback_lock = threading.Lock()
+        self._egresses = {}
+
+    def _call(self, script, *args):
+        """Run a script on the shared bucket, None while Redis is down and the in-process bucket is in use"""
+        retry_at = self._redis_retry_at
+        if retry_at is not None and time.monotonic() < retry_at:
+            return None
+        try:
+            result = get_redis().eval(script, 1, self.key, *args)
+        except Exception as e:
+            with self._fallback_lock:
+                if self._fallback is None:
+                    self._fallback = TokenBucket(self.rate, settings.RATE_LIMIT_BURST)
+                if self._redis_retry_at is None:
+                    logger.warning(f"Rate limiter {self.bucket}: Redis unavailable, limiting in-process: {str(e)}")
+                self._redis_retry_at = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY
+            return None
+        if retry_at is not None:
+            with self._fallback_lock:
+                if self._redis_retry_at is not None:
+                    logger.info(f"Rate limiter {self.bucket}: Redis is back, limiting shared again")
+                    self._redis_retry_at = None
+        return result
+
+    def for_proxy(self, proxy):
+        """
+        The limiter for requests leaving through proxy (None for direct).
+
+        A task's limiter is keyed on the proxy it was assigned, but a request
+        can leave through another when that one is full or quarantined; it
+        must be paced, and its 429s counted, on the egress it actually used.
+        """
+        bucket = egress_bucket(proxy)
+        if bucket == self.bucket:
+            return self
+        with self._fallback_lock:
+            limiter = self._egresses.get(bucket)
+            if limiter is None:
+                limiter = self._egresses[bucket] = AdaptiveRateLimiter(bucket)
+            return limiter
+
+    def _set_rate(self, rate):
+        self.rate = float(rate)
+        RATE_LIMIT.labels(self.bucket).set(self.rate)
+        return self.rate
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it"""
+        result = self._call(
+            _RESERVE_SCRIPT, settings.RATE_LIMIT_INITIAL, settings.RATE_LIMIT_BURST,
+            settings.RATE_LIMIT_KEY_TTL,
+        )
+        if result is not None:
+            wait, rate = result
+            self._set_rate(rate)
+            return float(wait)
+        return self._fallback.reserve()
+
+    def take(self):
+        """
+        Take a token if one is available now and return 0, otherwise take
+        nothing and return how many seconds until one should be.
+        """
+        result = self._call(
+            _TAKE_SCRIPT, settings.RATE_LIMIT_INITIAL, settings.RATE_LIMIT_BURST,
+            settings.RATE_LIMIT_KEY_TTL,
+        )
+        if result is not None:
+            wait, rate = result
+            self._set_rate(rate)
+            return float(wait)
+        return self._fallback.take()
+
+    def refund(self):
+        """Give back a reserved token that will not be used"""
+        if self._call(_REFUND_SCRIPT, settings.RATE_LIMIT_BURST) is not None:
+            return
+        self._fallback.refund()
+
+    def acquire(self):
+        """
+        Block until a token is available, returns the time spent waiting.
+
+        Waits on take() rather than a reservation, so the shared bucket never
+        goes into debt for requests still waiting, and a rate change applies
+        to them right away.
+        """
+        waited = 0.0
+        while True:
+            wait = self.take()
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def record_success(self):
+        rate = self._call(
+            _SUCCESS_SCRIPT, settings.RATE_LIMIT_INITIAL, settings.RATE_LIMIT_INCREASE,
+            settings.RATE_LIMIT_MAX, settings.RATE_LIMIT_KEY_TTL,
+        )
+        if rate is not None:
+            self._set_rate(rate)
+            return
+        with self._fallback._lock:
+            rate = min(settings.RATE_LIMIT_MAX, self._fallback.rate + settings.RATE_LIMIT_INCREASE / self._fallback.rate)
+            self._fallback.rate = self._set_rate(rate)
+
+    def record_throttle(self):
+        THROTTLES_TOTAL.labels(self.bucket).inc()
+        rate = self._call(
+            _THROTTLE_SCRIPT, settings.RATE_LIMIT_INITIAL, settings.RATE_LIMIT_DECREASE,
+            settings.RATE_LIMIT_MIN, settings.RATE_LIMIT_COOLDOWN, settings.RATE_LIMIT_KEY_TTL,
+        )
+        if rate is not None:
+            logger.warning(f"Rate limiter {self.bucket}: Throttled, rate now {float(rate):.2f}/s")
+            self._set_rate(rate)
+            return
+        with self._fallback._lock:
+            now = time.monotonic()
+            if now - self._last_cut < settings.RATE_LIMIT_COOLDOWN:
+                return
+            self._last_cut = now
+            rate = max(settings.RATE_LIMIT_MIN, self._fallback.rate * settings.RATE_LIMIT_DECREASE)
+            self._fallback.rate = self._set_rate(rate)
+            self._fallback._tokens = min(self._fallback._tokens, 0.0)
+        logger.warning(f"Rate limiter {self.bucket}: Throttled, rate now {rate:.2f}/s")
+
+
+def get_limiter(rate=None, burst=None, proxy=None):
+    """A fixed TokenBucket when a rate is given, else the shared adaptive limiter for the egress"""
+    if rate:
+        return TokenBucket(rate, burst or settings.RATE_LIMIT_BURST)
+    return AdaptiveRateLimiter(egress_bucket(proxy))
@@ -0,0 +1,13 @@
+import redis
+from django.conf import settings
+
+
+_client = None
+
+
+def get_redis():
+    """Shared client for the Redis instance the Celery broker runs on"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.SCRAPER_REDIS_URL)
+    return _client
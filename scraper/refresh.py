@@ -0,0 +1,156 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .db import in_worker_thread
+from .extractors import extract_video_info
+from .models import Video, VideoStatSnapshot
+from .proxies import assigned_proxy_url, proxied
+from .ratelimit import AdaptiveRateLimiter, TokenBucket, egress_bucket
+
+
+logger = get_task_logger(__name__)
+
+STAT_FIELDS = ['view_count', 'like_count', 'comment_count']
+
+# Refresh cycles share one sticky proxy assignment, like a long-running task
+REFRESH_PROXY_KEY = 'stats-refresh'
+
+
+def next_refresh_at(upload_date, now=None):
+    """
+    Schedule the next stats refresh with age-based decay.
+
+    A fresh upload is refreshed every STATS_REFRESH_MIN_INTERVAL, and the interval
+    doubles for every STATS_REFRESH_HALF_LIFE of age up to STATS_REFRESH_MAX_INTERVAL.
+    """
+    now = now or timezone.now()
+    age = max((now - (upload_date or now)).total_seconds(), 0)
+
+    # Cap the exponent so very old videos don't overflow before hitting the max interval
+    exponent = min(age / settings.STATS_REFRESH_HALF_LIFE, 64)
+    interval = min(settings.STATS_REFRESH_MIN_INTERVAL * 2 ** exponent, settings.STATS_REFRESH_MAX_INTERVAL)
+    return now + timedelta(seconds=interval)
+
+
+def due_videos(limit, now=None):
+    """Videos whose next refresh is due, most overdue first"""
+    now = now or timezone.now()
+    return list(
+        Video.objects
+        .filter(Q(next_stats_refresh_at__lte=now) | Q(next_stats_refresh_at__isnull=True))
+        .only('id', 'video_id', 'video_url', 'upload_date', *STAT_FIELDS)
+        .order_by(F('next_stats_refresh_at').asc(nulls_last=True))[:limit]
+    )
+
+
+class Backpressure(Exception):
+    """A fetch given up at the cycle's deadline, not a failure of the proxy it was going through"""
+
+
+def fetch_stats(video, proxy=None, limiter=None):
+    """Fetch the current counts for one video, None when yt-dlp returned nothing"""
+    # Counts must be current, so no extraction cache here; refresh_batch already took the tokens
+    info = extract_video_info(video.video_url, proxy, limiter=limiter, required=('view_count',), use_cache=False,
+                              pace=False)
+    return {field: info.get(field) for field in STAT_FIELDS} if info else None
+
+
+def refresh_batch(videos, limiter, deadline, concurrency, shared=None):
+    """
+    Refetch stats for a batch and write them with bulk_update, returns (refreshed, attempted).
+
+    Requests wait for both the refresh's own limiter and, when given, the
+    adaptive limiter shared with the scrapes, keyed on the proxy the
+    request goes through.
+    """
+
+    @in_worker_thread
+    def fetch(video):
+        try:
+            with proxied(REFRESH_PROXY_KEY) as proxy:
+                egress = shared.for_proxy(proxy) if shared else None
+                # Backpressure: anything not started before the deadline waits for the next cycle. Tokens
+                # reserved for a fetch that is given up go back, or they'd hold back the scrapes sharing the bucket.
+                delay = limiter.reserve()
+                if time.monotonic() + delay >= deadline:
+                    limiter.refund()
+                    raise Backpressure()
+                if egress:
+                    delay = max(delay, egress.reserve())
+                    if time.monotonic() + delay >= deadline:
+                        limiter.refund()
+                        egress.refund()
+                        raise Backpressure()
+                time.sleep(delay)
+                return video, fetch_stats(video, proxy, egress), True
+        except Backpressure:
+            return video, None, False
+        except Exception as e:
+            logger.warning(f"Stats refresh failed for {video.video_id}: {str(e)}")
+            return video, None, True
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(videos)))) as executor:
+        results = list(executor.map(fetch, videos))
+
+    now = timezone.now()
+    updated = []
+    snapshots = []
+    for video, stats, attempted in results:
+        if not attempted:
+            continue
+        video.next_stats_refresh_at = next_refresh_at(video.upload_date, now)
+        if stats is not None:
+            for field, value in stats.items():
+                if value is not None:
+                    setattr(video, field, value)
+            video.stats_refreshed_at = now
+            snapshots.append(VideoStatSnapshot(
+                video=video,
+                view_count=video.view_count,
+                like_count=video.like_count,
+                comment_count=video.comment_count,
+            ))
+        # Failed fetches are still rescheduled so a broken video can't hog every cycle
+        updated.append(video)
+
+    if updated:
+        Video.objects.bulk_update(
+            updated, STAT_FIELDS + ['stats_refreshed_at', 'next_stats_refresh_at']
+        )
+    if snapshots:
+        VideoStatSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots), len(updated)
+
+
+def run_refresh_cycle(interval=None):
+    """Refresh due videos in batches until none are due or the cycle's time budget runs out"""
+    interval = interval or settings.STATS_REFRESH_INTERVAL
+    start = time.monotonic()
+    deadline = start + interval * settings.STATS_REFRESH_BUDGET
+    # The refresh's own cap, on top of the adaptive rate it shares with the scrapes
+    limiter = TokenBucket(settings.STATS_REFRESH_RATE, settings.STATS_REFRESH_BURST)
+    shared = AdaptiveRateLimiter(egress_bucket(assigned_proxy_url(REFRESH_PROXY_KEY)))
+    batch_size = settings.STATS_REFRESH_BATCH_SIZE
+    refreshed = 0
+    batches = 0
+
+    while time.monotonic() < deadline:
+        videos = due_videos(batch_size)
+        if not videos:
+            break
+        batch_refreshed, attempted = refresh_batch(
+            videos, limiter, deadline, settings.STATS_REFRESH_CONCURRENCY, shared
+        )
+        refreshed += batch_refreshed
+        batches += 1
+        if not attempted:
+            # The rate limit can't fit another fetch into this cycle
+            break
+
+    elapsed = time.monotonic() - start
+    logger.info(f"Stats refresh: {refreshed} videos refreshed in {batches} batches, {elapsed:.2f}s")
+    return {'refreshed': refreshed, 'batches': batches, 'elapsed': elapsed}
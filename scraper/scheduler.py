@@ -0,0 +1,208 @@
+import uuid
+from collections import Counter, deque
+from datetime import timedelta
+from celery.signals import task_postrun
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from .coalesce import claim_channel, normalize_channel_url, release_channel
+from .models import ScrapingTask
+from .redis_client import get_redis
+
+
+logger = get_task_logger(__name__)
+
+# Named priorities accepted by the batch API, lower runs first
+PRIORITIES = {
+    'high': 0,
+    'normal': 5,
+    'low': 9,
+}
+
+SCHEDULER_LOCK_KEY = 'scraper:scheduler'
+SCHEDULER_KICK_KEY = 'scraper:scheduler:kick'
+
+# Finishing one of these frees a channel slot
+SLOT_TASKS = ('scraper.tasks.scrape_youtube_channel', 'scraper.tasks.finalize_channel_scrape')
+
+
+def enqueue_batch(channel_urls, max_videos=20, priority='normal', tenant='', incremental=False, tier='full',
+                  backfill=()):
+    """
+    Create a pending ScrapingTask per distinct channel, for schedule_pending() to dispatch.
+
+    Returns the batch ID and how many tasks were created.
+    """
+    batch_id = str(uuid.uuid4())
+    urls = list(dict.fromkeys(normalize_channel_url(url) for url in channel_urls))
+    options = {'max_videos': max_videos, 'incremental': incremental, 'tier': tier, 'backfill': list(backfill)}
+    ScrapingTask.objects.bulk_create(
+        [
+            ScrapingTask(
+                task_id=str(uuid.uuid4()),
+                channel_url=url,
+                batch_id=batch_id,
+                tenant=tenant,
+                priority=PRIORITIES[priority],
+                scrape_options=options,
+            )
+            for url in urls
+        ],
+        batch_size=settings.SCHEDULER_CREATE_BATCH_SIZE,
+    )
+    logger.info(f"Batch {batch_id}: Queued {len(urls)} channels for tenant '{tenant}' at priority {priority}")
+    return {'batch_id': batch_id, 'tasks': len(urls), 'duplicates': len(channel_urls) - len(urls)}
+
+
+def active_tasks():
+    """Dispatched tasks that are still pending or running, interactive ones included"""
+    stale_before = timezone.now() - timedelta(seconds=settings.SCRAPE_INFLIGHT_TTL)
+    return ScrapingTask.objects.filter(
+        status__in=[ScrapingTask.PENDING, ScrapingTask.PROCESSING],
+        dispatched_at__gte=stale_before,
+    )
+
+
+def waiting_tasks(exclude_channels=()):
+    """Batch tasks the scheduler has not dispatched yet, leaving out tasks for the given channels"""
+    waiting = ScrapingTask.objects.filter(status=ScrapingTask.PENDING, dispatched_at__isnull=True).exclude(batch_id='')
+    if exclude_channels:
+        waiting = waiting.exclude(channel_url__in=exclude_channels)
+    return waiting
+
+
+def pick_tasks(slots, exclude_channels=()):
+    """
+    Choose up to `slots` waiting tasks: the best priority level first, and
+    within a level, the tenant with the fewest channels in flight next.
+    Each tenant's own tasks go oldest first. Tasks for exclude_channels are passed over.
+    """
+    running = Counter(dict(active_tasks().values_list('tenant').annotate(count=Count('id'))))
+    waiting = waiting_tasks(exclude_channels)
+    picked = []
+    levels = waiting.values_list('priority', flat=True).distinct().order_by('priority')
+    for level in levels:
+        if len(picked) >= slots:
+            break
+        tenants = waiting.filter(priority=level).values_list('tenant', flat=True).distinct()
+        queues = {
+            tenant: deque(waiting.filter(priority=level, tenant=tenant).order_by('created_at', 'id')[:slots - len(picked)])
+            for tenant in tenants
+        }
+        while queues and len(picked) < slots:
+            tenant = min(queues, key=lambda name: running[name])
+            picked.append(queues[tenant].popleft())
+            running[tenant] += 1
+            if not queues[tenant]:
+                del queues[tenant]
+    return picked
+
+
+def dispatch(task):
+    """Start a picked task unless its channel is already being scraped; returns whether it started"""
+    # Imported here, tasks imports this module
+    from .tasks import scrape_youtube_channel
+
+    if claim_channel(task.channel_url, task.task_id):
+        # Someone else holds the channel, try again on a later pass
+        return False
+    if not ScrapingTask.objects.filter(pk=task.pk, dispatched_at__isnull=True).update(dispatched_at=timezone.now()):
+        release_channel(task.channel_url, task.task_id)
+        return False
+
+    options = dict(task.scrape_options)
+    max_videos = options.pop('max_videos', 20)
+    scrape_youtube_channel.apply_async(
+        args=(task.task_id, task.channel_url, max_videos),
+        kwargs=options,
+        queue=settings.SCHEDULER_QUEUE,
+    )
+    return True
+
+
+def fill_slots(slots):
+    """
+    Dispatch up to `slots` waiting tasks, returns how many started.
+
+    A task whose channel is already being scraped stays waiting, and the
+    slot it would have taken goes to the next task in line instead, so a
+    busy channel at the head of the queue never holds the others back.
+    Every waiting task for that channel is passed over for the rest of the
+    pass, at most SCHEDULER_MAX_BLOCKED_CHANNELS channels per pass.
+    """
+    dispatched = 0
+    blocked = set()
+    while dispatched < slots and len(blocked) < settings.SCHEDULER_MAX_BLOCKED_CHANNELS:
+        picked = pick_tasks(slots - dispatched, blocked)
+        if not picked:
+            break
+        for task in picked:
+            if task.channel_url in blocked:
+                continue
+            if dispatch(task):
+                dispatched += 1
+            else:
+                blocked.add(task.channel_url)
+    if blocked:
+        logger.info(f"Scheduler: Passed over {len(blocked)} channels already being scraped")
+    return dispatched
+
+
+def schedule_pending():
+    """
+    Dispatch waiting batch tasks into the free channel slots.
+
+    At most SCHEDULER_MAX_CONCURRENT_CHANNELS channel scrapes run at once,
+    counting interactive scrapes, which never wait. A big import therefore
+    fills only the slots that are left and leaves the queue short.
+    """
+    lock = get_redis().lock(SCHEDULER_LOCK_KEY, timeout=settings.SCHEDULER_INTERVAL * 2)
+    if not lock.acquire(blocking=False):
+        return {'status': 'skipped'}
+
+    try:
+        slots = settings.SCHEDULER_MAX_CONCURRENT_CHANNELS - active_tasks().count()
+        if slots <= 0:
+            return {'status': 'full', 'dispatched': 0}
+
+        dispatched = fill_slots(slots)
+        if dispatched:
+            logger.info(f"Scheduler: Dispatched {dispatched} channel scrapes into {slots} free slots")
+        return {'status': 'ok', 'dispatched': dispatched}
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+
+def kick_scheduler():
+    """Run a scheduling pass soon, at most one per SCHEDULER_KICK_DEBOUNCE seconds"""
+    from .tasks import schedule_scrapes
+
+    try:
+        if not get_redis().set(SCHEDULER_KICK_KEY, 1, nx=True, px=int(settings.SCHEDULER_KICK_DEBOUNCE * 1000)):
+            return
+    except Exception as e:
+        logger.warning(f"Scheduler kick unavailable, waiting for beat: {str(e)}")
+        return
+    schedule_scrapes.apply_async(countdown=settings.SCHEDULER_KICK_DEBOUNCE)
+
+
+@task_postrun.connect
+def _kick_on_slot_freed(task=None, **kwargs):
+    """Fill a freed slot right away instead of at the next beat"""
+    if task is not None and task.name in SLOT_TASKS:
+        kick_scheduler()
+
+
+def batch_status(batch_id):
+    """Task counts by status for one batch, waiting ones counted apart from dispatched pending ones"""
+    tasks = ScrapingTask.objects.filter(batch_id=batch_id)
+    counts = dict(tasks.values_list('status').annotate(count=Count('id')))
+    waiting = waiting_tasks().filter(batch_id=batch_id).count()
+    if waiting:
+        counts[ScrapingTask.PENDING] -= waiting
+        counts['waiting'] = waiting
+    return counts
@@ -1,11 +1,32 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Channel, Video, ScrapingTask
+from .models import Channel, Video, VideoStatSnapshot, ScrapingTask
+from .scheduler import PRIORITIES
+from .writer import LISTING_BACKFILL_FIELDS
+
+class SparseFieldsMixin:
+    """Accepts a `fields` argument and drops every serializer field not listed in it"""
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 class VideoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Video
         fields = '__all__'
 
+class VideoListSerializer(SparseFieldsMixin, VideoSerializer):
+    pass
+
+class VideoStatSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VideoStatSnapshot
+        fields = ['view_count', 'like_count', 'comment_count', 'captured_at']
+
 class ChannelSerializer(serializers.ModelSerializer):
     videos_count = serializers.SerializerMethodField()
     
@@ -14,18 +35,17 @@ class ChannelSerializer(serializers.ModelSerializer):
         fields = '__all__'
     
     def get_videos_count(self, obj):
-        return obj.videos.count()
+        # Annotated by the viewsets' querysets, falls back to a COUNT for plain instances
+        count = getattr(obj, 'videos_count', None)
+        return count if count is not None else obj.videos.count()
 
-class ChannelDetailSerializer(serializers.ModelSerializer):
-    videos = VideoSerializer(many=True, read_only=True)
-    videos_count = serializers.SerializerMethodField()
+class ChannelDetailSerializer(ChannelSerializer):
+    # Newest videos only, prefetched by ChannelViewSet; the full list is paginated at /channels/{id}/videos/
+    videos = VideoSerializer(source='recent_videos', many=True, read_only=True)
     
     class Meta:
         model = Channel
         fields = '__all__'
-    
-    def get_videos_count(self, obj):
-        return obj.videos.count()
 
 class ScrapingTaskSerializer(serializers.ModelSerializer):
     channel = ChannelSerializer(read_only=True)
@@ -36,4 +56,23 @@ class ScrapingTaskSerializer(serializers.ModelSerializer):
 
 class ScrapeChannelRequestSerializer(serializers.Serializer):
     channel_url = serializers.URLField()
-    max_videos = serializers.IntegerField(default=50, min_value=1, max_value=500)
\ No newline at end of file
+    max_videos = serializers.IntegerField(default=50, min_value=1, max_value=500)
+    incremental = serializers.BooleanField(default=False)
+    # 'listing' stores videos from the uploads tab alone, one request per ~30 videos
+    tier = serializers.ChoiceField(choices=['full', 'listing'], default='full')
+    # Listing tier: fields worth one more request per video still missing them; none by default
+    backfill = serializers.MultipleChoiceField(choices=LISTING_BACKFILL_FIELDS, default=list)
+    # Minutes; if the channel was scraped this recently, return that task instead of scraping again
+    fresh_within = serializers.IntegerField(required=False, min_value=1)
+
+class ScrapeBatchRequestSerializer(serializers.Serializer):
+    channel_urls = serializers.ListField(
+        child=serializers.URLField(), min_length=1, max_length=settings.SCHEDULER_MAX_BATCH_SIZE
+    )
+    max_videos = serializers.IntegerField(default=50, min_value=1, max_value=500)
+    incremental = serializers.BooleanField(default=False)
+    tier = serializers.ChoiceField(choices=['full', 'listing'], default='full')
+    backfill = serializers.MultipleChoiceField(choices=LISTING_BACKFILL_FIELDS, default=list)
+    priority = serializers.ChoiceField(choices=list(PRIORITIES), default='normal')
+    # Channel slots are shared fairly between tenants; defaults to the requesting user
+    tenant = serializers.CharField(max_length=100, required=False, allow_blank=True)
\ No newline at end of file
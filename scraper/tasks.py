@@ -1,14 +1,32 @@
-from celery import shared_task, group
+from celery import shared_task, group, chord
+from celery.exceptions import SoftTimeLimitExceeded
 from celery.utils.log import get_task_logger
-import yt_dlp
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
+import asyncio
+import itertools
 import re
 import time
-import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from django.db import transaction
-from .models import Channel, Video, ScrapingTask
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import Q
+from .models import Channel, Video, ScrapingTask, VideoScrapeAttempt
+from .async_engine import scrape_videos_async
+from .cache import get_extraction_cache
+from .checkpoints import ScrapeCheckpoint
+from .coalesce import release_channel
+from .db import in_worker_thread, release_connections
+from .extractors import extract_video_info, extractor, fetch_info
+from .failures import EmptyExtraction, record_failure, resolve_failures, tombstoned_ids
+from .metrics import TASKS_TOTAL, VIDEOS_TOTAL, TaskTimings, record_phase, timed_extraction, timed_phase, timed_step
+from .progress import ProgressReporter, publish_progress
+from .proxies import assigned_proxy_url, is_proxy_error, proxied
+from .ratelimit import AdaptiveRateLimiter, get_limiter, track_response
+from .redis_client import get_redis
+from .refresh import next_refresh_at, run_refresh_cycle
+from .scheduler import enqueue_batch, schedule_pending
+from .writer import LISTING_BACKFILL_FIELDS, LISTING_UPDATE_FIELDS, VideoWriter, upsert_videos
 from django.utils.timezone import make_aware
 from datetime import datetime
 from django.utils.timezone import is_naive
@@ -17,54 +35,33 @@ from django.utils.timezone import is_naive
 # Configure logger
 logger = get_task_logger(__name__)
 
-# User agents pool for rotation
-USER_AGENTS = [
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0',
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/121.0'
-]
-
-def get_ydl_opts(use_proxy=False, proxy_url=None):
-    opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'extractaudio': False,
-        'extractvideo': False,
-        'cookiefile': None,  # You can add cookie file path here
-        'user_agent': random.choice(USER_AGENTS),
-        'sleep_interval': random.uniform(1, 3),
-        'max_sleep_interval': random.uniform(1, 2),
-        'sleep_interval_requests': random.uniform(0.5, 1.5),
-        'sleep_interval_subtitles': random.uniform(1, 2),
-        'retries': 3,
-        'fragment_retries': 3,
-        'extractor_retries': 3,
-        'file_access_retries': 3,
-        'http_chunk_size': 10485760,  # 10MB chunks
-        'concurrent_fragment_downloads': 4,
-        'http_headers': {
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-us,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-    }
-    
-    if use_proxy and proxy_url:
-        opts['proxy'] = proxy_url
-    
-    return opts
-
-@shared_task(bind=True, max_retries=3)
-def scrape_youtube_channel(self, task_id, channel_url, max_videos=20, use_parallel=True, batch_size=10):
+@shared_task(bind=True, max_retries=3, acks_late=True, reject_on_worker_lost=True)
+def scrape_youtube_channel(self, task_id, channel_url, max_videos=20, use_parallel=True,
+                           concurrency=None, rate=None, burst=None, engine='thread',
+                           chunk_size=None, chunk_queue=None, incremental=False, tier='full',
+                           backfill=()):
     """
     Optimized YouTube channel scraper with parallel processing
+
+    concurrency tunes the video scraping pool and defaults to SCRAPE_CONCURRENCY.
+    Requests are paced by the shared adaptive rate limiter unless rate
+    (requests/sec) and burst pin this task to a fixed rate. engine='async'
+    scrapes on an asyncio loop instead of a thread pool, with concurrency
+    defaulting to SCRAPE_ASYNC_CONCURRENCY. engine='distributed' fans the videos
+    out across the worker fleet in chunks of chunk_size, routed to chunk_queue.
+    incremental=True only scrapes uploads newer than the videos already stored.
+    tier='listing' stores videos straight from the uploads tab in one pass, see
+    store_listing_entries(); backfill names the fields (LISTING_BACKFILL_FIELDS)
+    worth a full extraction per video, see queue_missing_details().
+    A per-phase timing breakdown is saved on the task as `timings`.
+    
+    Progress is checkpointed (see scraper.checkpoints): a retry, or a redelivery
+    after a worker dies mid-task, reuses the channel and video list and only
+    scrapes the videos that were neither stored nor handed to the video
+    retry queue yet.
     """
     start_time = time.time()
+    timings = TaskTimings()
     logger.info(f"Starting YouTube scraping task {task_id} for channel: {channel_url}")
     
     try:
@@ -75,11 +72,22 @@ def scrape_youtube_channel(self, task_id, channel_url, max_videos=20, use_parall
         
         # Phase 1: Extract channel information
         logger.info(f"Task {task_id}: Extracting channel information...")
+        publish_progress(task_id, 'processing', phase='channel')
         channel_start = time.time()
+        # The task sticks to one proxy from the pool (if any), and to that proxy's rate limit
+        limiter = get_limiter(rate, burst, assigned_proxy_url(task_id))
+        checkpoint = ScrapeCheckpoint(task_id)
+        resume = checkpoint.load()
         
-        channel = extract_channel_info(task_id, channel_url)
-        if not channel:
-            raise Exception("Failed to extract channel information")
+        channel = Channel.objects.filter(pk=resume['channel']).first() if 'channel' in resume else None
+        if channel:
+            logger.info(f"Task {task_id}: Resuming from checkpoint, channel already extracted")
+        else:
+            with timed_phase('channel', timings):
+                channel = extract_channel_info(task_id, channel_url, timings, limiter)
+            if not channel:
+                raise Exception("Failed to extract channel information")
+            checkpoint.save_channel(channel)
         
         task.channel = channel
         task.save()
@@ -89,39 +97,129 @@ def scrape_youtube_channel(self, task_id, channel_url, max_videos=20, use_parall
         
         # Phase 2: Get video list
         logger.info(f"Task {task_id}: Getting video list...")
+        publish_progress(task_id, 'processing', phase='listing')
         video_list_start = time.time()
         
-        video_urls = get_channel_video_urls(channel.channel_id, max_videos)
-        total_videos = len(video_urls)
+        newest_video_id = None
+        if tier != 'listing' and 'videos' in resume:
+            # The listing tier needs the entries themselves, it lists again
+            video_ids, newest_video_id = resume['videos'], resume['newest']
+            entries = None
+        else:
+            with timed_phase('listing', timings):
+                if incremental:
+                    entries, newest_video_id = get_new_channel_video_entries(
+                        task_id, channel, max_videos, timings=timings, limiter=limiter
+                    )
+                else:
+                    entries = get_channel_video_entries(channel.channel_id, max_videos, timings, limiter, task_id)
+            video_ids = [entry['id'] for entry in entries]
+            if tier != 'listing':
+                checkpoint.save_videos(video_ids, newest_video_id)
+        total_videos = len(video_ids)
         
         video_list_end = time.time()
         logger.info(f"Task {task_id}: Found {total_videos} videos in {video_list_end - video_list_start:.2f}s")
         
-        if not video_urls:
-            logger.warning(f"Task {task_id}: No videos found for channel")
+        if not video_ids:
+            logger.warning(f"Task {task_id}: No {'new ' if incremental else ''}videos found for channel")
+            checkpoint.clear()
+            advance_high_water_mark(channel, newest_video_id)
+            record_phase('total', time.time() - start_time, timings)
             task.status = ScrapingTask.COMPLETED
             task.videos_scraped = 0
             task.completed_at = timezone.now()
+            task.timings = timings.as_dict()
             task.save()
+            TASKS_TOTAL.labels('completed').inc()
+            release_inflight(task_id, channel_url)
+            publish_progress(task_id, 'completed', done=0, total=0, videos_scraped=0)
             return {'status': 'success', 'channel_id': channel.id, 'videos_scraped': 0}
         
-        # Phase 3: Scrape videos
+        # Phase 3: Scrape videos, skipping the ones an earlier attempt already stored
+        pending_ids = checkpoint.pending(video_ids) if tier != 'listing' else video_ids
+        if len(pending_ids) < total_videos:
+            logger.info(f"Task {task_id}: Resuming from checkpoint, {total_videos - len(pending_ids)}/{total_videos} videos already stored")
+        # Videos that failed before: tombstoned ones are skipped without a request, the rest are tried again
+        earlier_failures = dict(
+            VideoScrapeAttempt.objects.filter(video_id__in=pending_ids).values_list('video_id', 'status')
+        ) if tier != 'listing' else {}
+        tombstoned = {video_id for video_id, status in earlier_failures.items() if status == VideoScrapeAttempt.TOMBSTONED}
+        if tombstoned:
+            logger.info(f"Task {task_id}: Skipping {len(tombstoned)} tombstoned videos")
+            pending_ids = [video_id for video_id in pending_ids if video_id not in tombstoned]
+        video_urls = [watch_url(video_id) for video_id in pending_ids]
+        
+        if engine == 'distributed' and tier != 'listing':
+            # Chunks report their own timings, finalize_channel_scrape adds them to these
+            task.timings = timings.as_dict()
+            task.save(update_fields=['timings'])
+            return dispatch_video_chunks(
+                task_id, channel, video_urls,
+                chunk_size=chunk_size, queue=chunk_queue,
+                concurrency=concurrency, rate=rate, burst=burst,
+                newest_video_id=newest_video_id,
+            )
+        
         videos_scraped = 0
-        if use_parallel:
-            videos_scraped = scrape_videos_parallel(task_id, channel, video_urls, batch_size)
-        else:
-            videos_scraped = scrape_videos_sequential(task_id, channel, video_urls)
+        progress = ProgressReporter(task_id, len(video_urls))
+        progress.update(0, force=True)
+        with timed_phase('videos', timings):
+            if tier == 'listing':
+                videos_scraped = store_listing_entries(task_id, channel, entries, timings)
+                progress.update(total_videos, force=True)
+            elif use_parallel and engine == 'async':
+                videos_scraped = asyncio.run(scrape_videos_async(
+                    task_id, channel, video_urls, limiter,
+                    concurrency or settings.SCRAPE_ASYNC_CONCURRENCY,
+                    settings.SCRAPE_ASYNC_EXECUTOR_WORKERS,
+                    progress, timings, checkpoint,
+                ))
+            elif use_parallel:
+                videos_scraped = scrape_videos_parallel(
+                    task_id, channel, video_urls, limiter,
+                    concurrency or settings.SCRAPE_CONCURRENCY,
+                    progress, timings, checkpoint,
+                )
+            else:
+                videos_scraped = scrape_videos_sequential(task_id, channel, video_urls, limiter, progress, timings, checkpoint)
+        
+        if tier != 'listing':
+            # Count what earlier attempts stored too
+            done, _ = checkpoint.counts()
+            if done is not None:
+                videos_scraped = done
+            retried = [video_id for video_id in earlier_failures if video_id not in tombstoned]
+            if retried:
+                stored = set(retried) - set(checkpoint.pending(retried))
+                resolve_failures(stored)
+        
+        advance_high_water_mark(channel, newest_video_id)
+        
+        end_time = time.time()
+        total_time = end_time - start_time
+        record_phase('total', total_time, timings)
         
         # Update task completion
         task.status = ScrapingTask.COMPLETED
         task.videos_scraped = videos_scraped
         task.completed_at = timezone.now()
+        task.timings = timings.as_dict()
         task.save()
+        checkpoint.clear()
+        TASKS_TOTAL.labels('completed').inc()
+        release_inflight(task_id, channel_url)
+        publish_progress(task_id, 'completed', done=total_videos, total=total_videos, videos_scraped=videos_scraped)
         
-        end_time = time.time()
-        total_time = end_time - start_time
         logger.info(f"Task {task_id}: Completed successfully in {total_time:.2f}s. Videos scraped: {videos_scraped}/{total_videos}")
         
+        if tier == 'listing' and backfill:
+            queue_missing_details(task_id, channel, entries, backfill, concurrency=concurrency, rate=rate, burst=burst)
+        
+        cache = get_extraction_cache()
+        if cache is not None:
+            logger.info(f"Task {task_id}: Extraction cache {cache.stats()}")
+        
         return {
             'status': 'success',
             'channel_id': channel.id,
@@ -132,34 +230,153 @@ def scrape_youtube_channel(self, task_id, channel_url, max_videos=20, use_parall
         
     except Exception as e:
         logger.error(f"Task {task_id}: Failed with error: {str(e)}")
+        will_retry = self.request.retries < self.max_retries
         
         try:
             task = ScrapingTask.objects.get(task_id=task_id)
-            task.status = ScrapingTask.FAILED
             task.error_message = str(e)
-            task.completed_at = timezone.now()
+            task.timings = timings.as_dict()
+            if will_retry:
+                # Not terminal: the scheduler keeps counting the task against its tenant's slots, and the
+                # event stream's database fallback keeps waiting, until the retry has run
+                task.status = ScrapingTask.PENDING
+                if task.dispatched_at:
+                    task.dispatched_at = timezone.now()
+            else:
+                task.status = ScrapingTask.FAILED
+                task.completed_at = timezone.now()
             task.save()
         except:
             pass
         
         # Retry logic
-        if self.request.retries < self.max_retries:
+        if will_retry:
             retry_delay = (2 ** self.request.retries) * 60  # Exponential backoff
             logger.info(f"Task {task_id}: Retrying in {retry_delay} seconds...")
+            TASKS_TOTAL.labels('retrying').inc()
+            publish_progress(task_id, 'retrying', error=str(e), retry_in=retry_delay)
             raise self.retry(countdown=retry_delay, exc=e)
         
+        TASKS_TOTAL.labels('failed').inc()
+        release_inflight(task_id, channel_url)
+        publish_progress(task_id, 'failed', error=str(e))
         return {'status': 'error', 'error': str(e)}
 
-def extract_channel_info(task_id, channel_url):
+def dispatch_video_chunks(task_id, channel, video_urls, chunk_size=None, queue=None,
+                          concurrency=None, rate=None, burst=None, newest_video_id=None):
+    """Split the video list into chunk subtasks and finalize the task from a chord callback"""
+    chunk_size = chunk_size or settings.SCRAPE_CHUNK_SIZE
+    queue = queue or settings.SCRAPE_CHUNK_QUEUE
+    chunks = [video_urls[i:i + chunk_size] for i in range(0, len(video_urls), chunk_size)]
+    
+    logger.info(f"Task {task_id}: Dispatching {len(video_urls)} videos as {len(chunks)} chunks to queue '{queue}'")
+    
+    header = group(
+        scrape_video_chunk.s(task_id, channel.id, chunk, concurrency, rate, burst).set(queue=queue)
+        for chunk in chunks
+    )
+    # Routed to the persistence queue by CELERY_TASK_ROUTES
+    callback = finalize_channel_scrape.s(task_id, len(video_urls), newest_video_id)
+    result = chord(header)(callback)
+    publish_progress(task_id, 'processing', phase='distributed', total=len(video_urls), chunks=len(chunks))
+    
+    return {
+        'status': 'dispatched',
+        'channel_id': channel.id,
+        'total_videos': len(video_urls),
+        'chunks': len(chunks),
+        'chord_id': result.id,
+    }
+
+@shared_task(bind=True, max_retries=3, acks_late=True, reject_on_worker_lost=True)
+def scrape_video_chunk(self, task_id, channel_pk, video_urls, concurrency=None, rate=None, burst=None):
+    """
+    Scrape one chunk of a channel's videos, returns the number stored and the chunk's timings.
+
+    A redelivered chunk skips the videos the task's checkpoint already has stored.
+    """
+    timings = TaskTimings()
+    try:
+        channel = Channel.objects.get(pk=channel_pk)
+        # Hand the connection back before the long part: on the gevent extraction worker every chunk is a
+        # green thread sharing the process's DB_POOL_MAX_SIZE connections, and holding one for the whole
+        # chunk leaves the other chunks waiting for DB_POOL_TIMEOUT
+        release_connections()
+        limiter = get_limiter(rate, burst, assigned_proxy_url(task_id))
+        checkpoint = ScrapeCheckpoint(task_id)
+        pending_ids = set(checkpoint.pending([extract_video_id_from_url(url) for url in video_urls]))
+        video_urls = [url for url in video_urls if extract_video_id_from_url(url) in pending_ids]
+        with timed_phase('videos', timings):
+            written = scrape_videos_parallel(
+                task_id, channel, video_urls, limiter,
+                concurrency or settings.SCRAPE_CONCURRENCY,
+                timings=timings, checkpoint=checkpoint,
+            )
+        return {'written': written, 'timings': timings.as_dict()}
+    except OperationalError as e:
+        # No database connection, typically DB_POOL_TIMEOUT with every pooled one in use: the chunk's
+        # videos are fine, run it again later instead of dropping them
+        if self.request.retries < self.max_retries:
+            retry_delay = (2 ** self.request.retries) * 30
+            logger.warning(f"Task {task_id}: Database unavailable for a chunk of {len(video_urls)} videos, retrying in {retry_delay}s: {str(e)}")
+            raise self.retry(countdown=retry_delay, exc=e)
+        logger.error(f"Task {task_id}: Dropping a chunk of {len(video_urls)} videos, database unavailable after {self.max_retries} retries: {str(e)}")
+        return {'written': 0, 'timings': timings.as_dict()}
+    except Exception as e:
+        # Never fail the chord header, a lost chunk just lowers videos_scraped
+        logger.exception(f"Task {task_id}: Error scraping chunk of {len(video_urls)} videos: {str(e)}")
+        return {'written': 0, 'timings': timings.as_dict()}
+
+@shared_task
+def finalize_channel_scrape(chunk_results, task_id, total_videos, newest_video_id=None):
+    """
+    Chord callback: combine chunk results and complete the ScrapingTask.
+
+    Chunk timings are summed, so the 'videos' phase and its steps count
+    worker time across the fleet rather than wall time.
+    """
+    videos_scraped = sum(result['written'] for result in chunk_results)
+    checkpoint = ScrapeCheckpoint(task_id)
+    done, _ = checkpoint.counts()
+    if done:
+        # Includes videos stored by attempts of redelivered chunks
+        videos_scraped = done
+    checkpoint.clear()
+    
+    task = ScrapingTask.objects.select_related('channel').get(task_id=task_id)
+    if task.channel:
+        advance_high_water_mark(task.channel, newest_video_id)
+    
+    timings = TaskTimings(task.timings)
+    for result in chunk_results:
+        timings.merge(result['timings'])
+    
+    task.status = ScrapingTask.COMPLETED
+    task.videos_scraped = videos_scraped
+    task.completed_at = timezone.now()
+    task.timings = timings.as_dict()
+    task.save()
+    TASKS_TOTAL.labels('completed').inc()
+    release_inflight(task_id, task.channel_url)
+    publish_progress(task_id, 'completed', done=total_videos, total=total_videos, videos_scraped=videos_scraped)
+    
+    logger.info(f"Task {task_id}: Completed distributed scrape. Videos scraped: {videos_scraped}/{total_videos}")
+    
+    return {
+        'status': 'success',
+        'channel_id': task.channel_id,
+        'videos_scraped': videos_scraped,
+        'total_videos': total_videos,
+    }
+
+def extract_channel_info(task_id, channel_url, timings=None, limiter=None):
     """Extract channel information with error handling"""
+    limiter = limiter or AdaptiveRateLimiter()
     try:
-        ydl_opts = get_ydl_opts()
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Add random delay to avoid detection
-            time.sleep(random.uniform(1, 3))
-            
-            channel_info = ydl.extract_info(channel_url, download=False, process=False)
+        with proxied(task_id) as proxy, extractor('channel', proxy=proxy) as ydl:
+            channel_info = fetch_info(
+                ydl, 'channel', channel_url, limiter=limiter.for_proxy(proxy), timings=timings, process=False,
+            )
             
             # Get channel ID
             if 'channel_id' in channel_info:
@@ -168,7 +385,7 @@ def extract_channel_info(task_id, channel_url):
                 channel_id = extract_channel_id_from_url(channel_url)
             
             # Create or update channel with transaction
-            with transaction.atomic():
+            with timed_step('channel.save', timings), transaction.atomic():
                 channel, created = Channel.objects.get_or_create(
                     channel_id=channel_id,
                     defaults={
@@ -195,153 +412,345 @@ def extract_channel_info(task_id, channel_url):
         logger.error(f"Task {task_id}: Error extracting channel info: {str(e)}")
         return None
 
-def get_channel_video_urls(channel_id, max_videos):
-    """Get video URLs from channel efficiently"""
+def watch_url(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+def get_channel_video_entries(channel_id, max_videos, timings=None, limiter=None, task_id=None):
+    """Flat uploads-tab entries of the channel: id, title, view count, duration and thumbnails"""
+    limiter = limiter or AdaptiveRateLimiter()
     try:
-        ydl_opts = get_ydl_opts()
-        ydl_opts.update({
-            'extract_flat': True,  # Don't extract full video info, just metadata
-            'playlistend': max_videos,
-        })
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with proxied(task_id) as proxy, extractor('playlist', proxy=proxy, playlistend=max_videos) as ydl:
             playlist_url = f"https://www.youtube.com/channel/{channel_id}/videos"
+            playlist_info = fetch_info(
+                ydl, 'playlist', playlist_url, step='listing', limiter=limiter.for_proxy(proxy), timings=timings,
+            )
             
-            # Add random delay
-            time.sleep(random.uniform(1, 2))
-            
-            playlist_info = ydl.extract_info(playlist_url, download=False)
-            
-            video_urls = []
-            if 'entries' in playlist_info:
-                for entry in playlist_info['entries'][:max_videos]:
-                    if entry and entry.get('id'):
-                        video_urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
-            
-            return video_urls
+            return [entry for entry in (playlist_info.get('entries') or [])[:max_videos] if entry and entry.get('id')]
             
     except Exception as e:
         logger.error(f"Error getting video URLs: {str(e)}")
+        if is_proxy_error(e):
+            # Throttled or a bad proxy, not an empty channel: let the task retry
+            raise
         return []
 
-def scrape_videos_parallel(task_id, channel, video_urls, batch_size=10):
-    """Scrape videos using parallel processing with batching"""
-    logger.info(f"Task {task_id}: Starting parallel video scraping with {len(video_urls)} videos, batch size: {batch_size}")
-    
-    videos_scraped = 0
-    total_batches = (len(video_urls) + batch_size - 1) // batch_size
+def get_new_channel_video_entries(task_id, channel, max_videos, known_run=None, timings=None, limiter=None):
+    """
+    Get flat entries of uploads newer than what is already stored for the channel.
+
+    The uploads tab is read lazily page by page, with one video_id__in query
+    per page, and reading stops at the channel's high-water mark or after
+    known_run consecutive videos that are already stored. Returns the new
+    entries and the newest video ID seen, to be saved once they are scraped.
+    """
+    known_run = known_run or settings.INCREMENTAL_KNOWN_RUN
+    limiter = limiter or AdaptiveRateLimiter()
+    page_size = settings.INCREMENTAL_PAGE_SIZE
+    new_entries = []
+    newest_video_id = None
     
-    # Process videos in batches to avoid overwhelming the server
-    for batch_num, i in enumerate(range(0, len(video_urls), batch_size), 1):
-        batch_start = time.time()
-        batch_urls = video_urls[i:i + batch_size]
-        
-        logger.info(f"Task {task_id}: Processing batch {batch_num}/{total_batches} ({len(batch_urls)} videos)")
-        
-        # Use ThreadPoolExecutor for parallel processing
-        with ThreadPoolExecutor(max_workers=min(5, len(batch_urls))) as executor:
-            # Submit all video scraping tasks
-            future_to_url = {
-                executor.submit(scrape_single_video, task_id, channel, url): url 
-                for url in batch_urls
-            }
+    try:
+        # One proxy for the whole scan, continuation pages belong to the first page's session
+        with proxied(task_id) as proxy, extractor('playlist', proxy=proxy) as ydl:
+            limiter = limiter.for_proxy(proxy)
+            playlist_url = f"https://www.youtube.com/channel/{channel.channel_id}/videos"
+            
+            # process=False keeps 'entries' as a generator that fetches continuation pages on demand
+            playlist_info = fetch_info(
+                ydl, 'playlist', playlist_url, step='listing', limiter=limiter, timings=timings, use_cache=False,
+                process=False,
+            )
+            entries = (entry for entry in playlist_info.get('entries') or [] if entry and entry.get('id'))
             
-            # Process completed tasks
-            batch_scraped = 0
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    result = future.result()
-                    if result:
-                        batch_scraped += 1
-                        videos_scraped += 1
-                except Exception as e:
-                    logger.error(f"Task {task_id}: Error scraping video {url}: {str(e)}")
+            seen_known = 0
+            scanned = 0
+            while scanned < max_videos:
+                # Each page may fetch a continuation, pace it like any other request
+                with timed_step('listing.throttle', timings):
+                    limiter.acquire()
+                with timed_extraction('listing', ydl, timings), track_response(limiter):
+                    page = list(itertools.islice(entries, min(page_size, max_videos - scanned)))
+                if not page:
+                    break
+                scanned += len(page)
+                newest_video_id = newest_video_id or page[0]['id']
+                
+                with timed_step('listing.lookup', timings):
+                    known_ids = set(
+                        Video.objects.filter(video_id__in=[entry['id'] for entry in page]).values_list('video_id', flat=True)
+                    )
+                for entry in page:
+                    video_id = entry['id']
+                    if video_id == channel.latest_video_id:
+                        seen_known = known_run
+                        break
+                    if video_id in known_ids:
+                        seen_known += 1
+                        if seen_known >= known_run:
+                            break
+                    else:
+                        seen_known = 0
+                        new_entries.append(entry)
+                
+                if seen_known >= known_run:
+                    break
         
-        batch_end = time.time()
-        logger.info(f"Task {task_id}: Batch {batch_num} completed in {batch_end - batch_start:.2f}s. Scraped: {batch_scraped}/{len(batch_urls)}")
+        logger.info(f"Task {task_id}: Incremental scan read {scanned} uploads, {len(new_entries)} new")
+        return new_entries, newest_video_id
         
-        # Add delay between batches to avoid rate limiting
-        if batch_num < total_batches:
-            delay = random.uniform(2, 5)
-            logger.info(f"Task {task_id}: Waiting {delay:.1f}s before next batch...")
-            time.sleep(delay)
+    except Exception as e:
+        logger.error(f"Task {task_id}: Error getting new video URLs: {str(e)}")
+        if is_proxy_error(e):
+            raise
+        return [], None
+
+def advance_high_water_mark(channel, newest_video_id):
+    """Record the newest upload once a scrape that saw it has finished"""
+    if newest_video_id and newest_video_id != channel.latest_video_id:
+        channel.latest_video_id = newest_video_id
+        channel.save(update_fields=['latest_video_id', 'updated_at'])
+
+def store_listing_entries(task_id, channel, entries, timings=None):
+    """
+    Listing tier: store videos straight from flat uploads-tab entries, no per-video requests.
+
+    The tab gives title, view count, duration, thumbnails and, with the
+    approximate_date extractor arg, a rough upload date. New rows are inserted
+    with that; existing rows only get the listing fields refreshed, keeping
+    their exact upload date, description and counts. A field the tab left
+    empty keeps its stored value.
+    """
+    batch_size = settings.VIDEO_WRITE_BATCH_SIZE
+    now = timezone.now()
+    written = 0
+    for i in range(0, len(entries), batch_size):
+        batch = entries[i:i + batch_size]
+        with timed_step('db.write', timings):
+            stored = {
+                row['video_id']: row
+                for row in Video.objects.filter(video_id__in=[entry['id'] for entry in batch])
+                .values('video_id', 'title', 'duration', 'view_count', 'thumbnail_url')
+            }
+            videos = [build_listing_video(channel, entry, stored.get(entry['id']), now) for entry in batch]
+            written += upsert_videos(videos, LISTING_UPDATE_FIELDS)
+    
+    VIDEOS_TOTAL.labels('listed').inc(written)
+    logger.info(f"Task {task_id}: Stored {written} videos from the uploads tab")
+    return written
+
+def build_listing_video(channel, entry, stored=None, now=None):
+    """Build an unsaved Video from a flat playlist entry, falling back to the stored row's values"""
+    now = now or timezone.now()
+    stored = stored or {}
+    timestamp = entry.get('timestamp')
+    upload_date = datetime.fromtimestamp(timestamp, tz=dt_timezone.utc) if timestamp else None
+    
+    def pick(field, value):
+        return value if value not in (None, '') else stored.get(field, value)
+    
+    return Video(
+        video_id=entry['id'],
+        channel=channel,
+        title=pick('title', (entry.get('title') or '')[:500]),
+        duration=pick('duration', parse_duration(entry.get('duration'))),
+        view_count=pick('view_count', entry.get('view_count')),
+        upload_date=upload_date,
+        thumbnail_url=pick('thumbnail_url', get_best_thumbnail(entry.get('thumbnails') or [])),
+        video_url=watch_url(entry['id']),
+        stats_refreshed_at=now,
+        next_stats_refresh_at=next_refresh_at(upload_date, now),
+    )
+
+def queue_missing_details(task_id, channel, entries, fields=LISTING_BACKFILL_FIELDS, concurrency=None, rate=None,
+                          burst=None):
+    """
+    Queue full extraction for listed videos that have never had one and are missing one of `fields`.
+
+    Each queued video costs one more request (two when the metadata fast
+    path falls back), against one per page of the uploads tab for the whole
+    listing. The tab never has likes, comments, tags or the full description,
+    so asking for any of those queues every video not extracted yet.
+
+    Keyed off details_scraped_at as well as empty columns: plenty of videos
+    have no description or hide their like count, and would otherwise be
+    extracted again after every listing scrape.
+    """
+    missing = Q()
+    for field in fields:
+        if field == 'description':
+            missing |= Q(description='')
+        elif field == 'tags':
+            missing |= Q(tags=[])
+        else:
+            missing |= Q(**{f"{field}__isnull": True})
+    if not missing:
+        return 0
+
+    video_ids = [entry['id'] for entry in entries]
+    video_urls = list(
+        Video.objects.filter(missing, video_id__in=video_ids, details_scraped_at__isnull=True)
+        .exclude(video_id__in=tombstoned_ids(video_ids))
+        .values_list('video_url', flat=True)
+    )
+    if not video_urls:
+        return 0
     
-    return videos_scraped
+    chunk_size = settings.SCRAPE_CHUNK_SIZE
+    queue = settings.LISTING_DETAIL_QUEUE
+    group(
+        scrape_video_chunk.s(task_id, channel.id, video_urls[i:i + chunk_size], concurrency, rate, burst).set(queue=queue)
+        for i in range(0, len(video_urls), chunk_size)
+    ).apply_async()
+    logger.info(f"Task {task_id}: Queued {len(video_urls)} videos for full extraction on '{queue}'")
+    return len(video_urls)
 
-def scrape_videos_sequential(task_id, channel, video_urls):
+def scrape_videos_parallel(task_id, channel, video_urls, limiter, concurrency=5, progress=None, timings=None,
+                           checkpoint=None):
+    """Scrape videos on one long-lived thread pool, paced by a shared rate limiter"""
+    logger.info(f"Task {task_id}: Starting parallel video scraping with {len(video_urls)} videos, concurrency: {concurrency}")
+    
+    start = time.time()
+    videos_scraped = 0
+    processed = 0
+    # The writer flushes whatever is buffered even when scraping stops with an exception
+    with VideoWriter(task_id, timings=timings, checkpoint=checkpoint) as writer:
+        # Workers pull the next URL as soon as they are free, so one slow video never stalls the others
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(video_urls)))) as executor:
+            try:
+                future_to_url = {
+                    executor.submit(in_worker_thread(scrape_single_video), task_id, channel, url, writer, timings, limiter): url
+                    for url in video_urls
+                }
+                
+                for future in as_completed(future_to_url):
+                    url = future_to_url[future]
+                    processed += 1
+                    try:
+                        if future.result():
+                            videos_scraped += 1
+                    except Exception as e:
+                        logger.error(f"Task {task_id}: Error scraping video {url}: {str(e)}")
+                    
+                    if progress:
+                        progress.update(processed)
+                    if processed % 10 == 0:
+                        elapsed = time.time() - start
+                        logger.info(f"Task {task_id}: Progress: {processed}/{len(video_urls)} videos processed ({processed / elapsed:.2f} videos/s)")
+            except BaseException:
+                # A soft time limit or worker shutdown: drop the videos not started yet instead of scraping
+                # them all before the exception gets out, the checkpoint lets the retry pick them up
+                executor.shutdown(cancel_futures=True)
+                raise
+    
+    written = writer.written
+    logger.info(f"Task {task_id}: Stored {written}/{videos_scraped} scraped videos in {time.time() - start:.2f}s")
+    return written
+
+def scrape_videos_sequential(task_id, channel, video_urls, limiter, progress=None, timings=None, checkpoint=None):
     """Scrape videos sequentially (fallback method)"""
     logger.info(f"Task {task_id}: Starting sequential video scraping with {len(video_urls)} videos")
     
     videos_scraped = 0
-    for i, url in enumerate(video_urls, 1):
-        try:
-            if scrape_single_video(task_id, channel, url):
-                videos_scraped += 1
-            
-            if i % 10 == 0:
-                logger.info(f"Task {task_id}: Progress: {i}/{len(video_urls)} videos processed")
+    with VideoWriter(task_id, timings=timings, checkpoint=checkpoint) as writer:
+        for i, url in enumerate(video_urls, 1):
+            try:
+                if scrape_single_video(task_id, channel, url, writer, timings, limiter):
+                    videos_scraped += 1
                 
-            # Add random delay between requests
-            time.sleep(random.uniform(1, 3))
-            
-        except Exception as e:
-            logger.error(f"Task {task_id}: Error scraping video {url}: {str(e)}")
-            continue
+                if progress:
+                    progress.update(i)
+                if i % 10 == 0:
+                    logger.info(f"Task {task_id}: Progress: {i}/{len(video_urls)} videos processed")
+                
+            except SoftTimeLimitExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Task {task_id}: Error scraping video {url}: {str(e)}")
+                continue
     
-    return videos_scraped
+    written = writer.written
+    logger.info(f"Task {task_id}: Stored {written}/{videos_scraped} scraped videos")
+    return written
 
-def scrape_single_video(task_id, channel, video_url):
+def scrape_single_video(task_id, channel, video_url, writer=None, timings=None, limiter=None):
+    """
+    Scrape one video and hand it to the writer, refreshing stats if it already exists.
+
+    Every request made for it waits for a limiter token first; a video
+    served from the extraction cache waits for none. A failure is recorded
+    as a VideoScrapeAttempt, see scraper.failures.
+    """
+    video_id = extract_video_id_from_url(video_url)
     try:
-        video_id = extract_video_id_from_url(video_url)
         if not video_id:
+            VIDEOS_TOTAL.labels('failed').inc()
             return False
         
-        # Check if video already exists
-        if Video.objects.filter(video_id=video_id).exists():
-            return False
+        with proxied(task_id) as proxy:
+            video_info = extract_video_info(video_url, proxy, timings, limiter)
         
-        ydl_opts = get_ydl_opts()
-        ydl_opts.update({
-            'writesubtitles': False,
-            'writeautomaticsub': False,
-            'skip_download': True,
-        })
+        if not video_info:
+            raise EmptyExtraction("yt-dlp returned no info")
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Add small random delay
-            time.sleep(random.uniform(0.5, 1.5))
-            
-            video_info = ydl.extract_info(video_url, download=False)
-            
-            if not video_info:
-                return False
-            
-            # Create video with transaction - REMOVED TAGS
-            with transaction.atomic():
-                video, created = Video.objects.get_or_create(
-                    video_id=video_id,
-                    defaults={
-                        'channel': channel,
-                        'title': video_info.get('title', '')[:500],  # Limit title length
-                        'description': video_info.get('description', '')[:5000],  # Limit description
-                        'duration': str(video_info.get('duration', '')),
-                        'view_count': video_info.get('view_count'),
-                        'like_count': video_info.get('like_count'),
-                        'comment_count': video_info.get('comment_count'),
-                        'upload_date': parse_upload_date(video_info.get('upload_date')),
-                        'thumbnail_url': get_best_thumbnail(video_info.get('thumbnails', [])),
-                        'video_url': video_url,
-                        # REMOVED: 'tags': video_info.get('tags', [])[:50]
-                    }
-                )
-            
-            return created
-            
+        with timed_step('video.build', timings):
+            video = build_video(channel, video_id, video_url, video_info)
+        
+        # Rows are upserted in batches by the writer, fall back to a direct write without one
+        if writer is not None:
+            writer.add(video)
+        else:
+            with timed_step('db.write', timings):
+                upsert_videos([video])
+        
+        VIDEOS_TOTAL.labels('scraped').inc()
+        return True
+    
+    except SoftTimeLimitExceeded:
+        # Out of time: not this video's fault, let the task stop and retry
+        raise
     except Exception as e:
+        VIDEOS_TOTAL.labels('failed').inc()
         logger.error(f"Task {task_id}: Error in scrape_single_video for {video_url}: {str(e)}")
+        try:
+            # Tombstone it, or queue a retry of just this video
+            record_failure(task_id, channel, video_id, video_url, e)
+        except Exception as record_error:
+            # Still pending in the checkpoint, a retry of the task tries it again
+            logger.error(f"Task {task_id}: Could not record failure of {video_id}: {str(record_error)}")
+        else:
+            # One owner per failure: the retry queue has it, a retry of the task must not scrape it too
+            if writer is not None:
+                writer.add_failure(video_id)
         return False
 
+def build_video(channel, video_id, video_url, video_info):
+    """Build an unsaved Video from a yt-dlp info dict"""
+    now = timezone.now()
+    upload_date = parse_upload_date(video_info.get('upload_date'))
+    return Video(
+        video_id=video_id,
+        channel=channel,
+        title=(video_info.get('title') or '')[:500],  # Limit title length
+        description=(video_info.get('description') or '')[:5000],  # Limit description
+        duration=parse_duration(video_info.get('duration')),
+        view_count=video_info.get('view_count'),
+        like_count=video_info.get('like_count'),
+        comment_count=video_info.get('comment_count'),
+        upload_date=upload_date,
+        thumbnail_url=get_best_thumbnail(video_info.get('thumbnails', [])),
+        video_url=video_url,
+        stats_refreshed_at=now,
+        next_stats_refresh_at=next_refresh_at(upload_date, now),
+        details_scraped_at=now,
+    )
+
+def release_inflight(task_id, channel_url):
+    """Let new requests for the channel start a scrape again"""
+    try:
+        release_channel(channel_url, task_id)
+    except Exception as e:
+        logger.warning(f"Task {task_id}: Could not release in-flight marker: {str(e)}")
+
 def extract_video_id_from_url(url):
     """Extract video ID from YouTube URL"""
     patterns = [
@@ -379,12 +788,19 @@ def get_best_thumbnail(thumbnails):
     # Prefer high resolution thumbnails
     sorted_thumbnails = sorted(
         thumbnails, 
-        key=lambda x: (x.get('width', 0) * x.get('height', 0)), 
+        key=lambda x: ((x.get('width') or 0) * (x.get('height') or 0)), 
         reverse=True
     )
     
     return sorted_thumbnails[0]['url'] if sorted_thumbnails else ''
 
+def parse_duration(duration):
+    """Duration in whole seconds, yt-dlp may report it as a float"""
+    try:
+        return int(round(float(duration)))
+    except (ValueError, TypeError):
+        return None
+
 def parse_upload_date(date_str):
     """Parse upload date string to datetime"""
     if not date_str:
@@ -398,28 +814,56 @@ def parse_upload_date(date_str):
         return None
 
 
-# Batch processing task for multiple channels
 @shared_task
-def scrape_multiple_channels(channel_urls, max_videos_per_channel=20):
-    """Scrape multiple channels in parallel"""
-    logger.info(f"Starting batch scraping for {len(channel_urls)} channels")
+def refresh_video_stats():
+    """Celery beat entry point for the periodic view/like/comment refresh"""
+    interval = settings.STATS_REFRESH_INTERVAL
     
-    # Create individual tasks for each channel
-    job = group(
-        scrape_youtube_channel.s(
-            f"batch_{i}_{int(time.time())}", 
-            url, 
-            max_videos_per_channel
-        ) for i, url in enumerate(channel_urls)
-    )
+    # A cycle stops itself before the next one is due, the lock only guards against stray overlaps
+    lock = get_redis().lock('scraper:stats-refresh', timeout=interval)
+    if not lock.acquire(blocking=False):
+        logger.info("Stats refresh: previous cycle still running, skipping")
+        return {'status': 'skipped'}
     
-    result = job.apply_async()
-    return result.id
-
-
+    try:
+        return run_refresh_cycle(interval)
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass
 
 
+@shared_task
+def retry_video_scrape(video_id):
+    """Retry queue entry point: scrape again one video that failed transiently, see scraper.failures"""
+    attempt = VideoScrapeAttempt.objects.select_related('channel').filter(
+        video_id=video_id, status=VideoScrapeAttempt.RETRYING
+    ).first()
+    if attempt is None:
+        # Stored by a later scrape in the meantime, or tombstoned
+        return {'status': 'skipped'}
+    
+    limiter = get_limiter(proxy=assigned_proxy_url(attempt.task_id))
+    if scrape_single_video(attempt.task_id, attempt.channel, attempt.video_url, limiter=limiter):
+        resolve_failures([video_id])
+        logger.info(f"Task {attempt.task_id}: Video {video_id} stored on retry {attempt.attempts}")
+        return {'status': 'success'}
+    return {'status': 'failed'}
 
 
+@shared_task
+def schedule_scrapes():
+    """Celery beat entry point: dispatch waiting batch scrapes into free channel slots"""
+    return schedule_pending()
 
 
+# Batch processing task for multiple channels
+@shared_task
+def scrape_multiple_channels(channel_urls, max_videos_per_channel=20, priority='normal', tenant=''):
+    """Queue multiple channels as one batch, started by the scheduler as channel slots free up"""
+    logger.info(f"Starting batch scraping for {len(channel_urls)} channels")
+    
+    batch = enqueue_batch(channel_urls, max_videos_per_channel, priority=priority, tenant=tenant)
+    schedule_pending()
+    return batch['batch_id']
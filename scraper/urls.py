@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .events import task_events, tasks_events
 from .views import ChannelViewSet, VideoViewSet, ScrapingTaskViewSet
 
 router = DefaultRouter()
@@ -8,5 +9,7 @@ router.register(r'videos', VideoViewSet)
 router.register(r'tasks', ScrapingTaskViewSet)
 
 urlpatterns = [
+    path('tasks/events/', tasks_events, name='tasks-events'),
+    path('tasks/<str:task_id>/events/', task_events, name='task-events'),
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
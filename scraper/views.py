@@ -1,22 +1,50 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 import uuid
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from .coalesce import claim_channel, normalize_channel_url
+from .exports import (
+    CONTENT_TYPES, aiter_export, check_export_format, export_queryset, iter_export, iter_rows, stream_export,
+)
+from .metrics import metrics_registry
 from .models import Channel, Video, ScrapingTask
+from .pagination import VideoCursorPagination
 from .serializers import (
     ChannelSerializer, 
     ChannelDetailSerializer, 
     VideoSerializer, 
+    VideoListSerializer,
+    VideoStatSnapshotSerializer,
     ScrapingTaskSerializer,
-    ScrapeChannelRequestSerializer      
+    ScrapeChannelRequestSerializer,
+    ScrapeBatchRequestSerializer,
 )
-from .tasks import scrape_youtube_channel
+from .scheduler import batch_status, enqueue_batch
+from .tasks import schedule_scrapes, scrape_youtube_channel
 
 class ChannelViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Channel.objects.all()
     serializer_class = ChannelSerializer
     
+    def get_queryset(self):
+        queryset = Channel.objects.annotate(videos_count=Count('videos'))
+        if self.action == 'retrieve':
+            recent_videos = Video.objects.order_by('-upload_date')[:settings.CHANNEL_DETAIL_VIDEO_LIMIT]
+            queryset = queryset.prefetch_related(
+                Prefetch('videos', queryset=recent_videos, to_attr='recent_videos')
+            )
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return ChannelDetailSerializer
@@ -37,11 +65,113 @@ class ChannelViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 class VideoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Videos, newest first, with keyset pagination.
+
+    Query parameters: fields (comma separated, narrows both the response and the
+    SQL), channel, uploaded_after, uploaded_before (ISO dates) and min_views.
+    Videos without an upload date are listed after all dated ones.
+    """
     queryset = Video.objects.all().order_by('-upload_date')
-    serializer_class = VideoSerializer
+    serializer_class = VideoListSerializer
+    pagination_class = VideoCursorPagination
+    
+    # Always loaded, the cursor needs them to build the next page link
+    CURSOR_FIELDS = {'id', 'upload_date'}
+    
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        valid = set(VideoListSerializer().fields)
+        names = [name.strip() for name in fields.split(',')]
+        return [name for name in names if name in valid] or None
+    
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        
+        fields = self.requested_fields()
+        if fields:
+            queryset = queryset.only(*(set(fields) | self.CURSOR_FIELDS))
+        
+        if self.action == 'list':
+            queryset = self.filter_queryset_params(queryset)
+        return queryset
+    
+    def filter_queryset_params(self, queryset):
+        params = self.request.query_params
+        try:
+            if params.get('channel'):
+                queryset = queryset.filter(channel_id=int(params['channel']))
+            if params.get('uploaded_after'):
+                queryset = queryset.filter(upload_date__gte=parse_query_datetime(params['uploaded_after']))
+            if params.get('uploaded_before'):
+                queryset = queryset.filter(upload_date__lt=parse_query_datetime(params['uploaded_before']))
+            if params.get('min_views'):
+                queryset = queryset.filter(view_count__gte=int(params['min_views']))
+        except (TypeError, ValueError) as e:
+            raise ValidationError({'detail': f"Invalid filter parameter: {e}"})
+        return queryset
+    
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Get the view/like/comment history of a video"""
+        video = self.get_object()
+        snapshots = video.stat_snapshots.order_by('captured_at')
+        serializer = VideoStatSnapshotSerializer(snapshots, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every matching video as NDJSON, CSV or Parquet.
+
+        Query parameters: file_format (ndjson, csv or parquet; 'format' is taken by
+        DRF), channel, uploaded_after and uploaded_before.
+        """
+        params = request.query_params
+        file_format = params.get('file_format', 'ndjson')
+        try:
+            check_export_format(file_format)
+            queryset = export_queryset(
+                channel=int(params['channel']) if params.get('channel') else None,
+                uploaded_after=parse_query_datetime(params['uploaded_after']) if params.get('uploaded_after') else None,
+                uploaded_before=parse_query_datetime(params['uploaded_before']) if params.get('uploaded_before') else None,
+            )
+        except (TypeError, ValueError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Each handler buffers the other kind of iterator whole: async under ASGI, sync under WSGI
+        chunks = stream_export(file_format, iter_rows(queryset))
+        blocks = aiter_export(chunks) if isinstance(request._request, ASGIRequest) else iter_export(chunks)
+        response = StreamingHttpResponse(blocks, content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="videos.{file_format}"'
+        return response
+
+def parse_query_datetime(value):
+    """Parse an ISO date or datetime query parameter into an aware datetime"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"'{value}' is not an ISO date")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
 class ScrapingTaskViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = ScrapingTask.objects.all().order_by('-created_at')
+    # Channels and their video counts load in one extra query instead of a COUNT per task
+    queryset = ScrapingTask.objects.prefetch_related(
+        Prefetch('channel', queryset=Channel.objects.annotate(videos_count=Count('videos')))
+    ).order_by('-created_at')
     serializer_class = ScrapingTaskSerializer
     
     @action(detail=False, methods=['post'])
@@ -49,18 +179,48 @@ class ScrapingTaskViewSet(viewsets.ReadOnlyModelViewSet):
         """Start scraping a YouTube channel"""
         serializer = ScrapeChannelRequestSerializer(data=request.data)
         if serializer.is_valid():
-            channel_url = serializer.validated_data['channel_url']
+            channel_url = normalize_channel_url(serializer.validated_data['channel_url'])
             max_videos = serializer.validated_data['max_videos']
+            incremental = serializer.validated_data['incremental']
+            tier = serializer.validated_data['tier']
+            backfill = sorted(serializer.validated_data['backfill'])
+            fresh_within = serializer.validated_data.get('fresh_within')
+            
+            # Serve a recent enough result without scraping again
+            if fresh_within:
+                recent = ScrapingTask.objects.filter(
+                    channel_url=channel_url,
+                    status=ScrapingTask.COMPLETED,
+                    completed_at__gte=timezone.now() - timedelta(minutes=fresh_within),
+                ).order_by('-completed_at').first()
+                if recent:
+                    return Response({
+                        'task_id': recent.task_id,
+                        'status': 'cached',
+                        'message': 'Channel was scraped recently'
+                    }, status=status.HTTP_200_OK)
             
-            # Create task record
+            # Attach to the scrape already running for this channel, if any
             task_id = str(uuid.uuid4())
+            existing_task_id = claim_channel(channel_url, task_id)
+            if existing_task_id:
+                return Response({
+                    'task_id': existing_task_id,
+                    'status': 'in_progress',
+                    'message': 'Channel scraping already in progress'
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Create task record; interactive scrapes skip the scheduler but take a channel slot
             task = ScrapingTask.objects.create(
                 task_id=task_id,
-                channel_url=channel_url
+                channel_url=channel_url,
+                dispatched_at=timezone.now(),
             )
             
             # Start async task
-            scrape_youtube_channel.delay(task_id, channel_url, max_videos)
+            scrape_youtube_channel.delay(
+                task_id, channel_url, max_videos, incremental=incremental, tier=tier, backfill=backfill
+            )
             
             return Response({
                 'task_id': task_id,
@@ -70,14 +230,53 @@ class ScrapingTaskViewSet(viewsets.ReadOnlyModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def scrape_batch(self, request):
+        """Queue many channels at once; the scheduler starts them as channel slots free up"""
+        serializer = ScrapeBatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        tenant = data.get('tenant') or (request.user.get_username() if request.user.is_authenticated else '')
+        batch = enqueue_batch(
+            data['channel_urls'],
+            max_videos=data['max_videos'],
+            priority=data['priority'],
+            tenant=tenant,
+            incremental=data['incremental'],
+            tier=data['tier'],
+            backfill=sorted(data['backfill']),
+        )
+        schedule_scrapes.delay()
+        
+        return Response({
+            **batch,
+            'status': 'queued',
+            'message': f"{batch['tasks']} channels queued",
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path=r'batch/(?P<batch_id>[0-9a-f-]+)')
+    def batch(self, request, batch_id=None):
+        """Task counts by status for a batch, 'waiting' being the ones not dispatched yet"""
+        counts = batch_status(batch_id)
+        if not counts:
+            return Response({'error': 'Batch not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'batch_id': batch_id, 'tasks': sum(counts.values()), 'statuses': counts})
+    
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
         """Get status of a scraping task"""
-        task = get_object_or_404(ScrapingTask, task_id=pk)
+        task = get_object_or_404(self.get_queryset(), task_id=pk)
         serializer = self.get_serializer(task)
         return Response(serializer.data)
 
 
+def metrics(request):
+    """GET /metrics - Prometheus scrape endpoint for the scraper histograms and counters"""
+    return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
 # from rest_framework import viewsets, status
 # from rest_framework.decorators import action
 # from rest_framework.response import Response
@@ -0,0 +1,156 @@
+import queue
+import threading
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from .db import release_connections
+from .metrics import VIDEOS_TOTAL, timed_step
+from .models import Video
+
+
+logger = get_task_logger(__name__)
+
+# Columns refreshed when a scraped video already exists
+VIDEO_UPDATE_FIELDS = [
+    'title',
+    'description',
+    'duration',
+    'view_count',
+    'like_count',
+    'comment_count',
+    'upload_date',
+    'thumbnail_url',
+    'video_url',
+    'stats_refreshed_at',
+    'next_stats_refresh_at',
+    'details_scraped_at',
+    'updated_at',
+]
+
+# Columns a listing-tier scrape refreshes; the uploads tab has no likes, comments,
+# full description or exact upload date, and those keep their stored values
+LISTING_UPDATE_FIELDS = [
+    'title',
+    'duration',
+    'view_count',
+    'thumbnail_url',
+    'video_url',
+    'updated_at',
+]
+
+# Fields a listing-tier scrape can ask to backfill with a full extraction (scrape_youtube_channel's
+# backfill): the tab never has the last four, and gives no upload date, duration or view count for some videos
+LISTING_BACKFILL_FIELDS = ('upload_date', 'duration', 'view_count', 'description', 'like_count', 'comment_count', 'tags')
+
+
+def upsert_videos(videos, update_fields=None):
+    """Insert new videos and refresh existing ones with one statement per batch"""
+    # ON CONFLICT cannot touch the same row twice, keep the latest copy per video_id
+    unique = {video.video_id: video for video in videos}
+    if not unique:
+        return 0
+
+    Video.objects.bulk_create(
+        list(unique.values()),
+        update_conflicts=True,
+        unique_fields=['video_id'],
+        update_fields=update_fields or VIDEO_UPDATE_FIELDS,
+    )
+    return len(unique)
+
+
+class VideoWriter:
+    """
+    Buffers scraped videos from worker threads and flushes them from a single consumer thread.
+
+    With a ScrapeCheckpoint, videos are marked done once their batch is
+    written and failed when scraping or writing them failed.
+    """
+
+    _STOP = object()
+
+    def __init__(self, task_id, batch_size=None, flush_interval=None, update_fields=None, timings=None,
+                 checkpoint=None):
+        self.task_id = task_id
+        self.timings = timings
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size or getattr(settings, 'VIDEO_WRITE_BATCH_SIZE', 100)
+        self.flush_interval = flush_interval or getattr(settings, 'VIDEO_WRITE_FLUSH_INTERVAL', 2.0)
+        self.update_fields = update_fields or VIDEO_UPDATE_FIELDS
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"video-writer-{self.task_id}", daemon=True
+        )
+        self._thread.start()
+
+    def add(self, video):
+        """Queue a Video instance for the next flush"""
+        self._queue.put(video)
+
+    def add_failure(self, video_id):
+        """Record a video whose failure scraper.failures has taken over"""
+        if self.checkpoint is not None and video_id:
+            self.checkpoint.mark_failed([video_id])
+
+    def close(self):
+        """Flush everything still buffered and wait for the consumer to stop"""
+        if self._thread is None:
+            return self.written
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+        return self.written
+
+    def _run(self):
+        pending = []
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    pending = self._flush(pending)
+                    continue
+
+                if item is self._STOP:
+                    break
+
+                pending.append(item)
+                if len(pending) >= self.batch_size:
+                    pending = self._flush(pending)
+
+            self._flush(pending)
+        finally:
+            # The consumer thread owns its own connection, release it explicitly
+            release_connections()
+
+    def _flush(self, pending):
+        if not pending:
+            return pending
+        try:
+            with timed_step('db.write', self.timings):
+                written = upsert_videos(pending, self.update_fields)
+            self.written += written
+            VIDEOS_TOTAL.labels('written').inc(written)
+            if self.checkpoint is not None:
+                self.checkpoint.mark_done([video.video_id for video in pending])
+            logger.info(f"Task {self.task_id}: Flushed {len(pending)} videos to the database")
+        except Exception as e:
+            self.failed += len(pending)
+            VIDEOS_TOTAL.labels('write_failed').inc(len(pending))
+            # Nothing queued a retry of these, leave them pending for the task's own retry
+            logger.error(f"Task {self.task_id}: Failed to write {len(pending)} videos: {str(e)}")
+        finally:
+            # Back to the pool between flushes, the consumer only needs a connection while it writes
+            release_connections()
+        return []
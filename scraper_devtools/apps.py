@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class ScraperDevtoolsConfig(AppConfig):
+    """Benchmark, soak and queue load test harnesses; installed only with SCRAPER_DEV_TOOLS"""
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'scraper_devtools'
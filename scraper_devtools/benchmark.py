@@ -0,0 +1,589 @@
+"""
+Offline benchmark harness for scrape_youtube_channel.
+
+A local HTTP server replays channel, uploads-tab and video responses from
+fixtures, with configurable latency, jitter and 429 injection, and
+FakeYouTubeIE (installed through YDL_EXTRA_EXTRACTORS) answers youtube.com
+URLs from it, optionally through local stub proxies registered in the pool. Fixtures are yt-dlp info dicts, either generated or recorded
+from a real channel with record_fixtures(), so yt-dlp's page parsing is not
+part of the measurement; everything from the task down to the database is.
+A full video extraction also fetches a stream manifest and has yt-dlp sort
+and select its formats, which the metadata fast path skips.
+"""
+import calendar
+import json
+import os
+import random
+import resource
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlparse
+from urllib.request import ProxyHandler, build_opener
+from celery import current_app
+from django.db import connection, connections
+from prometheus_client import REGISTRY
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import ExtractorError
+from scraper.extractors import close_all_extractors, extractor
+from scraper.models import Channel, Proxy, ScrapingTask
+from scraper.proxies import get_proxy_pool
+from scraper.ratelimit import AdaptiveRateLimiter
+from scraper.redis_client import get_redis
+
+
+BENCHMARK_CHANNEL_ID = 'UCbenchmark0000000000000'
+
+# What a throttled request gets back: a 429, or a 200 bot-check page like YouTube's
+THROTTLE_STYLES = ('429', 'bot-check')
+BOT_CHECK_MESSAGE = "Sign in to confirm you're not a bot"
+
+# Video extraction paths to compare: the metadata fast path, or full extraction only
+METADATA_PATHS = ('fast', 'full')
+
+# Modes run by default; 'distributed' runs its chord eagerly in this process
+BENCHMARK_MODES = ('sequential', 'thread', 'async', 'distributed')
+
+MODE_OPTIONS = {
+    'sequential': {'use_parallel': False},
+    'thread': {'engine': 'thread'},
+    'async': {'engine': 'async'},
+    'distributed': {'engine': 'distributed'},
+}
+
+
+class Fixtures:
+    """Channel, uploads-tab and per-video info dicts served by the fake server"""
+
+    def __init__(self, channel, videos):
+        self.channel = channel
+        self.videos = videos  # {video_id: info dict}, in upload order, newest first
+
+    @property
+    def channel_id(self):
+        return self.channel['channel_id']
+
+    def playlist(self):
+        return {
+            '_type': 'playlist',
+            'id': self.channel_id,
+            'title': f"{self.channel.get('title', '')} - Videos",
+            # Shaped like yt-dlp's flat uploads-tab entries, approximate_date included
+            'entries': [
+                {'_type': 'url', 'id': video_id, 'url': f"https://www.youtube.com/watch?v={video_id}",
+                 'title': info.get('title'), 'duration': info.get('duration'),
+                 'view_count': info.get('view_count'), 'thumbnails': info.get('thumbnails'),
+                 'timestamp': self._timestamp(info.get('upload_date'))}
+                for video_id, info in self.videos.items()
+            ],
+        }
+
+    @staticmethod
+    def _timestamp(upload_date):
+        try:
+            return calendar.timegm(time.strptime(upload_date, '%Y%m%d'))
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def generate(cls, count, description_size=2000):
+        """Synthetic channel with `count` videos shaped like real yt-dlp output"""
+        rng = random.Random(count)
+        channel = {
+            'id': BENCHMARK_CHANNEL_ID,
+            'channel_id': BENCHMARK_CHANNEL_ID,
+            'title': 'Benchmark Channel',
+            'description': 'Generated by scraper_devtools.benchmark',
+            'channel_follower_count': 123456,
+            'thumbnails': [{'url': 'https://example.invalid/channel.jpg', 'width': 900, 'height': 900}],
+        }
+        videos = {}
+        now = time.time()
+        for i in range(count):
+            video_id = f"bench{i:06d}"
+            videos[video_id] = {
+                'id': video_id,
+                'title': f"Benchmark video {i}",
+                'description': ''.join(rng.choice('abcdefghij ') for _ in range(description_size)),
+                'duration': rng.randint(30, 3600),
+                'view_count': rng.randint(0, 10_000_000),
+                'like_count': rng.randint(0, 100_000),
+                'comment_count': rng.randint(0, 10_000),
+                'upload_date': time.strftime('%Y%m%d', time.gmtime(now - i * 86400)),
+                'thumbnails': [
+                    {'url': f"https://example.invalid/{video_id}/hq.jpg", 'width': 480, 'height': 360},
+                    {'url': f"https://example.invalid/{video_id}/maxres.jpg", 'width': 1280, 'height': 720},
+                ],
+            }
+        return cls(channel, videos)
+
+    @classmethod
+    def load(cls, path):
+        """Fixtures written by save(): channel.json, playlist.json and videos/<video_id>.json"""
+        with open(os.path.join(path, 'channel.json')) as f:
+            channel = json.load(f)
+        with open(os.path.join(path, 'playlist.json')) as f:
+            order = [entry['id'] for entry in json.load(f)['entries']]
+        videos = {}
+        for video_id in order:
+            with open(os.path.join(path, 'videos', f"{video_id}.json")) as f:
+                videos[video_id] = json.load(f)
+        return cls(channel, videos)
+
+    def save(self, path):
+        os.makedirs(os.path.join(path, 'videos'), exist_ok=True)
+        with open(os.path.join(path, 'channel.json'), 'w') as f:
+            json.dump(self.channel, f)
+        with open(os.path.join(path, 'playlist.json'), 'w') as f:
+            json.dump(self.playlist(), f)
+        for video_id, info in self.videos.items():
+            with open(os.path.join(path, 'videos', f"{video_id}.json"), 'w') as f:
+                json.dump(info, f)
+
+
+# Keys kept from real extractions, everything the scraper reads plus identifiers
+RECORDED_VIDEO_KEYS = (
+    'id', 'title', 'description', 'duration', 'view_count', 'like_count', 'comment_count',
+    'upload_date', 'thumbnails',
+)
+RECORDED_CHANNEL_KEYS = ('id', 'channel_id', 'title', 'description', 'channel_follower_count', 'thumbnails')
+
+
+def record_fixtures(channel_url, max_videos):
+    """Extract a real channel once through the normal extractors and keep what the scraper reads"""
+    with extractor('channel') as ydl:
+        info = ydl.extract_info(channel_url, download=False, process=False)
+        channel = {key: info.get(key) for key in RECORDED_CHANNEL_KEYS}
+        channel['channel_id'] = channel['channel_id'] or channel['id']
+
+    with extractor('playlist', playlistend=max_videos) as ydl:
+        playlist = ydl.extract_info(f"https://www.youtube.com/channel/{channel['channel_id']}/videos", download=False)
+        video_ids = [entry['id'] for entry in playlist.get('entries') or [] if entry and entry.get('id')]
+
+    videos = {}
+    with extractor('video') as ydl:
+        for video_id in video_ids[:max_videos]:
+            info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+            videos[video_id] = {key: info.get(key) for key in RECORDED_VIDEO_KEYS}
+    return Fixtures(channel, videos)
+
+
+class FakeYouTubeServer:
+    """
+    Threaded HTTP server replaying fixtures as JSON, with latency and jitter.
+
+    It throttles a random error_rate fraction of requests, and every request
+    beyond max_rate in the trailing second, like YouTube does.
+    """
+
+    def __init__(self, fixtures, latency=0.05, jitter=0.02, error_rate=0.0, max_rate=None,
+                 throttle_style='429', host='127.0.0.1', port=0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_rate = max_rate
+        self.throttle_style = throttle_style
+        self._recent = deque()
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-youtube', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.throttled = 0
+            self.bytes_sent = 0
+            self._recent.clear()
+
+    def respond(self, path, query):
+        """(status, payload) for a request, sleeping for the configured latency first"""
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            while self._recent and self._recent[0] <= now - 1.0:
+                self._recent.popleft()
+            self._recent.append(now)
+            over_rate = self.max_rate is not None and len(self._recent) > self.max_rate
+            if over_rate or (self.error_rate and random.random() < self.error_rate):
+                self.throttled += 1
+                if self.throttle_style == 'bot-check':
+                    return 200, {'error': BOT_CHECK_MESSAGE}
+                return 429, {'error': 'Too Many Requests'}
+
+        if path == '/watch':
+            info = self.fixtures.videos.get((query.get('v') or [''])[0])
+            return (200, info) if info else (404, {'error': 'Video unavailable'})
+        if path.startswith('/manifest/'):
+            return 200, {'formats': stream_formats(path.rsplit('/', 1)[-1])}
+        if path.endswith('/videos'):
+            return 200, self.fixtures.playlist()
+        return 200, self.fixtures.channel
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                status, payload = server.respond(parsed.path, parse_qs(parsed.query))
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 429:
+                    self.send_header('Retry-After', '1')
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def stream_formats(video_id):
+    """A DASH-sized format list for one video: video-only ladders per codec plus audio tracks"""
+    formats = []
+    for codec, ext in (('avc1.640028', 'mp4'), ('vp9', 'webm'), ('av01.0.08M.08', 'mp4')):
+        for height in (144, 240, 360, 480, 720, 1080, 1440, 2160):
+            for fps in (30, 60):
+                formats.append({
+                    'format_id': f"{codec.split('.')[0]}-{height}p{fps}",
+                    'url': f"https://example.invalid/videoplayback/{video_id}/{codec}/{height}/{fps}?expire=0&sig=" + 'x' * 120,
+                    'ext': ext, 'vcodec': codec, 'acodec': 'none',
+                    'height': height, 'width': height * 16 // 9, 'fps': fps,
+                    'tbr': height * fps / 20, 'filesize': height * fps * 1000,
+                })
+    for abr in (48, 128, 160):
+        for codec, ext in (('mp4a.40.2', 'm4a'), ('opus', 'webm')):
+            formats.append({
+                'format_id': f"{codec.split('.')[0]}-{abr}",
+                'url': f"https://example.invalid/videoplayback/{video_id}/{codec}/{abr}?expire=0&sig=" + 'x' * 120,
+                'ext': ext, 'vcodec': 'none', 'acodec': codec, 'abr': abr, 'tbr': abr,
+            })
+    return formats
+
+
+class StubProxy:
+    """Local forwarding HTTP proxy that drops fail_rate of its connections, like a flaky exit node"""
+
+    def __init__(self, latency=0.0, fail_rate=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._opener = build_opener(ProxyHandler({}))
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='stub-proxy', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with proxy._lock:
+                    proxy.requests += 1
+                    failed = random.random() < proxy.fail_rate
+                    proxy.failures += failed
+                if failed:
+                    # Hang up without a response
+                    self.close_connection = True
+                    return
+                time.sleep(proxy.latency)
+
+                try:
+                    with proxy._opener.open(self.path, timeout=30) as upstream:
+                        status, headers, body = upstream.status, upstream.headers, upstream.read()
+                except HTTPError as e:
+                    status, headers, body = e.code, e.headers, e.read()
+                self.send_response(status)
+                self.send_header('Content-Type', headers.get('Content-Type', 'application/octet-stream'))
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeYouTubeIE(InfoExtractor):
+    """
+    Answers youtube.com URLs from the FakeYouTubeServer at server_url.
+
+    Like the real YouTube extractor it fetches stream formats for a video
+    unless the youtube extractor args skip DASH manifests.
+    """
+
+    IE_NAME = 'fakeyoutube'
+    _VALID_URL = r'https?://(?:www\.)?youtube\.com/(?P<path>.+)'
+
+    server_url = None
+
+    def _real_extract(self, url):
+        path = self._match_valid_url(url).group('path')
+        info = self._download_json(f"{self.server_url}/{path}", path, note=False)
+        if info.get('error'):
+            raise ExtractorError(info['error'], expected=True)
+        if info.get('_type') == 'playlist' or info.get('channel_id'):
+            return info
+        if 'dash' in self._configuration_arg('skip', ie_key='youtube'):
+            return {**info, 'webpage_url': url}
+        manifest = self._download_json(f"{self.server_url}/manifest/{info['id']}", info['id'], note=False)
+        return {**info, 'webpage_url': url, 'formats': manifest['formats']}
+
+
+class QueryCounter:
+    """Counts SQL statements on every connection, including ones opened by worker threads"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def _install(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        for conn in connections.all():
+            conn.execute_wrappers.append(self)
+        connection_created.connect(self._install)
+        return self
+
+    def __exit__(self, *args):
+        connection_created.disconnect(self._install)
+        for conn in connections.all():
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+
+class RSSSampler:
+    """Peak resident set size over a block, sampled from /proc (falls back to ru_maxrss)"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile, None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def run_mode(mode, server, max_videos, task_options=None, metadata_path='fast'):
+    """Run one scrape_youtube_channel end to end against the fake server and measure it"""
+    # Imported here so the latency wrapper below replaces the name every engine looks up
+    from scraper import tasks
+
+    channel_id = server.fixtures.channel_id
+    channel_url = f"https://www.youtube.com/channel/{channel_id}"
+    Channel.objects.filter(channel_id=channel_id).delete()
+    task_id = f"benchmark-{mode}-{int(time.time() * 1000)}"
+    ScrapingTask.objects.create(task_id=task_id, channel_url=channel_url)
+    server.reset_counters()
+    limiter = AdaptiveRateLimiter()
+    try:
+        # Every mode starts from RATE_LIMIT_INITIAL
+        get_redis().delete(limiter.key)
+    except Exception:
+        pass
+
+    latencies = []
+    latencies_lock = threading.Lock()
+    scrape_single_video = tasks.scrape_single_video
+
+    def timed_scrape_single_video(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return scrape_single_video(*args, **kwargs)
+        finally:
+            with latencies_lock:
+                latencies.append(time.perf_counter() - start)
+
+    options = {**MODE_OPTIONS[mode], **(task_options or {})}
+    tasks.scrape_single_video = timed_scrape_single_video
+    try:
+        with QueryCounter() as queries, RSSSampler() as rss, \
+                override_settings(VIDEO_METADATA_FAST_PATH=metadata_path == 'fast'):
+            start = time.perf_counter()
+            # CPU of the whole process, so the fake server's share (serving JSON) is included
+            cpu_start = time.process_time()
+            tasks.scrape_youtube_channel.apply(args=(task_id, channel_url, max_videos), kwargs=options)
+            cpu = time.process_time() - cpu_start
+            wall = time.perf_counter() - start
+    finally:
+        tasks.scrape_single_video = scrape_single_video
+
+    task = ScrapingTask.objects.get(task_id=task_id)
+    videos = len(latencies)
+    return {
+        'mode': mode,
+        'metadata_path': metadata_path,
+        'task_id': task_id,
+        'status': task.status,
+        'error': task.error_message or None,
+        'videos': videos,
+        'videos_scraped': task.videos_scraped,
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(cpu, 3),
+        'cpu_ms_per_video': round(cpu * 1000 / videos, 2) if videos else None,
+        'videos_per_sec': round(task.videos_scraped / wall, 3) if wall else None,
+        'latency_p50': round(percentile(latencies, 0.50), 4) if latencies else None,
+        'latency_p95': round(percentile(latencies, 0.95), 4) if latencies else None,
+        'db_queries': queries.count,
+        'db_queries_per_video': round(queries.count / videos, 2) if videos else None,
+        'peak_rss_mb': round(rss.peak / (1024 * 1024), 1),
+        'server_requests': server.requests,
+        'server_throttled': server.throttled,
+        'server_bytes': server.bytes_sent,
+        'kb_per_video': round(server.bytes_sent / 1024 / videos, 1) if videos else None,
+        'final_rate': REGISTRY.get_sample_value('scraper_rate_limit', {'bucket': limiter.bucket}),
+        'timings': task.timings,
+    }
+
+
+def run_benchmark(fixtures, modes=BENCHMARK_MODES, max_videos=None, latency=0.05, jitter=0.02,
+                  error_rate=0.0, max_rate=None, throttle_style='429', proxies=0, proxy_fail_rate=0.0,
+                  use_cache=False, task_options=None, metadata_paths=('fast',)):
+    """Serve the fixtures locally and run every mode against them, returns a JSON-ready report"""
+    max_videos = max_videos or len(fixtures.videos)
+    overrides = {
+        'YDL_EXTRA_EXTRACTORS': ['scraper_devtools.benchmark.FakeYouTubeIE'],
+        # Keep the adaptive rate in its own bucket, away from the real one
+        'RATE_LIMIT_EGRESS': 'benchmark',
+        # Tasks run eagerly here, a queued retry would run inline and skew every mode's timings
+        'VIDEO_RETRY_MAX_ATTEMPTS': 0,
+    }
+    if not use_cache:
+        overrides['EXTRACTION_CACHE_BACKEND'] = None
+
+    results = []
+    stub_proxies = [StubProxy(fail_rate=proxy_fail_rate).start() for _ in range(proxies)]
+    # Only the stub proxies take part while the benchmark runs
+    real_proxies = list(Proxy.objects.filter(is_active=True).values_list('pk', flat=True)) if proxies else []
+    Proxy.objects.filter(pk__in=real_proxies).update(is_active=False)
+    pool_proxies = [Proxy.objects.create(url=stub.url) for stub in stub_proxies]
+    get_proxy_pool().reload()
+
+    with FakeYouTubeServer(fixtures, latency, jitter, error_rate, max_rate, throttle_style) as server, override_settings(**overrides):
+        FakeYouTubeIE.server_url = server.url
+        eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        # Extractors pooled before the override would still go to YouTube
+        close_all_extractors()
+        try:
+            for metadata_path in metadata_paths:
+                for mode in modes:
+                    results.append(run_mode(mode, server, max_videos, task_options, metadata_path))
+        finally:
+            current_app.conf.task_always_eager = eager
+            close_all_extractors()
+            Channel.objects.filter(channel_id=fixtures.channel_id).delete()
+            for stub in stub_proxies:
+                stub.stop()
+            Proxy.objects.filter(pk__in=[proxy.pk for proxy in pool_proxies]).delete()
+            Proxy.objects.filter(pk__in=real_proxies).update(is_active=True)
+            get_proxy_pool().reload()
+
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'database': connection.vendor,
+        'config': {
+            'videos': max_videos,
+            'latency': latency,
+            'jitter': jitter,
+            'error_rate': error_rate,
+            'max_rate': max_rate,
+            'throttle_style': throttle_style,
+            'proxies': proxies,
+            'proxy_fail_rate': proxy_fail_rate,
+            'use_cache': use_cache,
+            'task_options': task_options or {},
+            'metadata_paths': list(metadata_paths),
+        },
+        'results': results,
+        'proxies': [
+            {'url': stub.url, 'requests': stub.requests, 'failures': stub.failures}
+            for stub in stub_proxies
+        ],
+    }
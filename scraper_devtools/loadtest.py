@@ -0,0 +1,82 @@
+import time
+from celery.exceptions import TimeoutError as ResultTimeout
+from django.conf import settings
+from .benchmark import percentile
+from .tasks import queue_latency_probe
+
+
+# 'shared' sends everything to the default queue, as a single worker consuming one queue used to;
+# 'routed' sends each kind of task to the queue CELERY_TASK_ROUTES gives it
+TOPOLOGIES = ('shared', 'routed')
+
+# The real task whose route each kind of load test task follows
+KIND_TASKS = {
+    'discovery': 'scraper.tasks.scrape_youtube_channel',
+    'extraction': 'scraper.tasks.scrape_video_chunk',
+    'persistence': 'scraper.tasks.finalize_channel_scrape',
+}
+
+
+def queue_for(kind, topology):
+    if topology == 'shared':
+        return settings.CELERY_TASK_DEFAULT_QUEUE
+    route = settings.CELERY_TASK_ROUTES.get(KIND_TASKS[kind], {})
+    return route.get('queue', settings.CELERY_TASK_DEFAULT_QUEUE)
+
+
+def run_topology(topology, blockers=8, blocker_seconds=30.0, probes=100, probe_seconds=0.2,
+                 probe_interval=0.05, timeout=600):
+    """
+    Measure queue wait under load for one topology.
+
+    `blockers` long tasks stand in for channel scrapes and are sent first,
+    then `probes` short ones alternating between extraction and
+    persistence. Every task reports how long it waited between being sent
+    and starting on a worker. Needs the broker and the workers running.
+    """
+    sent = []
+    for _ in range(blockers):
+        queue = queue_for('discovery', topology)
+        sent.append(('discovery', queue_latency_probe.apply_async(args=(time.time(), blocker_seconds), queue=queue)))
+    for i in range(probes):
+        kind = ('extraction', 'persistence')[i % 2]
+        sent.append((kind, queue_latency_probe.apply_async(args=(time.time(), probe_seconds), queue=queue_for(kind, topology))))
+        time.sleep(probe_interval)
+
+    waits = {kind: [] for kind in KIND_TASKS}
+    timed_out = {kind: 0 for kind in KIND_TASKS}
+    deadline = time.monotonic() + timeout
+    for kind, result in sent:
+        try:
+            waits[kind].append(result.get(timeout=max(0.1, deadline - time.monotonic())))
+        except ResultTimeout:
+            timed_out[kind] += 1
+            result.revoke()
+
+    return {
+        'topology': topology,
+        'kinds': [
+            {
+                'kind': kind,
+                'queue': queue_for(kind, topology),
+                'tasks': len(waits[kind]) + timed_out[kind],
+                'timed_out': timed_out[kind],
+                'wait_p50': round(percentile(waits[kind], 0.50), 3) if waits[kind] else None,
+                'wait_p95': round(percentile(waits[kind], 0.95), 3) if waits[kind] else None,
+                'wait_max': round(max(waits[kind]), 3) if waits[kind] else None,
+            }
+            for kind in KIND_TASKS
+        ],
+    }
+
+
+def run_loadtest(topologies=TOPOLOGIES, **options):
+    """Run every topology in turn, each starting once the previous one's tasks have finished"""
+    return {
+        'settings': {
+            'prefetch_multiplier': settings.CELERY_WORKER_PREFETCH_MULTIPLIER,
+            'acks_late': settings.CELERY_TASK_ACKS_LATE,
+        },
+        'options': options,
+        'results': [run_topology(topology, **options) for topology in topologies],
+    }
@@ -0,0 +1,79 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from scraper_devtools.benchmark import BENCHMARK_MODES, METADATA_PATHS, MODE_OPTIONS, THROTTLE_STYLES, Fixtures, record_fixtures, run_benchmark
+
+
+class Command(BaseCommand):
+    help = "Benchmark scrape_youtube_channel offline against a local fake YouTube server"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=list(MODE_OPTIONS), default=list(BENCHMARK_MODES))
+        parser.add_argument('--videos', type=int, default=50, help="Videos in generated fixtures, and videos scraped per run")
+        parser.add_argument('--fixtures', help="Directory of recorded fixtures to replay instead of generated ones")
+        parser.add_argument('--record', metavar='CHANNEL_URL', help="Record fixtures from a real channel into --fixtures and exit")
+        parser.add_argument('--latency', type=float, default=0.05, help="Seconds the server waits before each response")
+        parser.add_argument('--jitter', type=float, default=0.02, help="Random +/- seconds added to the latency")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests throttled at random")
+        parser.add_argument('--max-rate', type=float, help="Throttle requests beyond this many per second")
+        parser.add_argument('--throttle-style', choices=THROTTLE_STYLES, default='429',
+                            help="Throttle with a 429 or with a bot-check page")
+        parser.add_argument('--proxies', type=int, default=0, help="Route requests through this many local stub proxies")
+        parser.add_argument('--proxy-fail-rate', type=float, default=0.0,
+                            help="Fraction of connections each stub proxy drops")
+        parser.add_argument('--use-cache', action='store_true', help="Keep the extraction cache on (later modes will hit it)")
+        parser.add_argument('--task-options', type=json.loads, default=None,
+                            help='Extra scrape_youtube_channel kwargs as JSON, e.g. \'{"concurrency": 10}\'')
+        parser.add_argument('--metadata-paths', nargs='+', choices=METADATA_PATHS, default=['fast'],
+                            help="Run every mode with the metadata fast path, full extraction, or both")
+        parser.add_argument('--output', '-o', help="Write the JSON report here")
+
+    def handle(self, *args, **options):
+        if options['record']:
+            if not options['fixtures']:
+                raise CommandError("--record needs --fixtures to write to")
+            fixtures = record_fixtures(options['record'], options['videos'])
+            fixtures.save(options['fixtures'])
+            self.stdout.write(f"Recorded {len(fixtures.videos)} videos to {options['fixtures']}")
+            return
+
+        if options['fixtures']:
+            fixtures = Fixtures.load(options['fixtures'])
+        else:
+            fixtures = Fixtures.generate(options['videos'])
+
+        report = run_benchmark(
+            fixtures,
+            modes=options['modes'],
+            max_videos=options['videos'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            max_rate=options['max_rate'],
+            throttle_style=options['throttle_style'],
+            proxies=options['proxies'],
+            proxy_fail_rate=options['proxy_fail_rate'],
+            use_cache=options['use_cache'],
+            task_options=options['task_options'],
+            metadata_paths=options['metadata_paths'],
+        )
+
+        self.stdout.write(f"{'mode':<12} {'path':<5} {'status':<10} {'videos':>7} {'wall s':>8} {'videos/s':>9} "
+                          f"{'p50 s':>7} {'p95 s':>7} {'q/video':>8} {'cpu ms/v':>9} {'KB/v':>7} "
+                          f"{'rss MB':>7} {'429s':>5} {'rate':>6}")
+        for result in report['results']:
+            self.stdout.write(
+                f"{result['mode']:<12} {result['metadata_path']:<5} {result['status']:<10} {result['videos_scraped']:>7} "
+                f"{result['wall_seconds']:>8.2f} {result['videos_per_sec'] or 0:>9.2f} "
+                f"{result['latency_p50'] or 0:>7.3f} {result['latency_p95'] or 0:>7.3f} "
+                f"{result['db_queries_per_video'] or 0:>8.2f} {result['cpu_ms_per_video'] or 0:>9.2f} "
+                f"{result['kb_per_video'] or 0:>7.1f} {result['peak_rss_mb']:>7.1f} "
+                f"{result['server_throttled']:>5} {result['final_rate'] or 0:>6.2f}"
+            )
+
+        for proxy in report['proxies']:
+            self.stdout.write(f"proxy {proxy['url']}: {proxy['requests']} requests, {proxy['failures']} dropped")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
@@ -0,0 +1,45 @@
+import json
+from django.core.management.base import BaseCommand
+from scraper_devtools.loadtest import TOPOLOGIES, run_loadtest
+
+
+class Command(BaseCommand):
+    help = ("Compare queue wait of short tasks behind long ones with every task on one queue ('shared', the "
+            "old single-worker setup) and with tasks routed to their own queues ('routed'). Needs the broker "
+            "and the workers of docker-compose.yml running.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--topologies', nargs='+', choices=TOPOLOGIES, default=list(TOPOLOGIES))
+        parser.add_argument('--blockers', type=int, default=8, help="Long tasks standing in for channel scrapes")
+        parser.add_argument('--blocker-seconds', type=float, default=30.0, help="How long each long task runs")
+        parser.add_argument('--probes', type=int, default=100, help="Short extraction and persistence tasks")
+        parser.add_argument('--probe-seconds', type=float, default=0.2, help="How long each short task runs")
+        parser.add_argument('--probe-interval', type=float, default=0.05, help="Seconds between sending short tasks")
+        parser.add_argument('--timeout', type=float, default=600, help="Seconds to wait for all tasks of a topology")
+        parser.add_argument('--output', '-o', help="Write the JSON report here")
+
+    def handle(self, *args, **options):
+        report = run_loadtest(
+            topologies=options['topologies'],
+            blockers=options['blockers'],
+            blocker_seconds=options['blocker_seconds'],
+            probes=options['probes'],
+            probe_seconds=options['probe_seconds'],
+            probe_interval=options['probe_interval'],
+            timeout=options['timeout'],
+        )
+
+        self.stdout.write(f"{'topology':<9} {'kind':<12} {'queue':<12} {'tasks':>6} {'timeout':>8} "
+                          f"{'p50 s':>8} {'p95 s':>8} {'max s':>8}")
+        for result in report['results']:
+            for kind in result['kinds']:
+                self.stdout.write(
+                    f"{result['topology']:<9} {kind['kind']:<12} {kind['queue']:<12} {kind['tasks']:>6} "
+                    f"{kind['timed_out']:>8} {kind['wait_p50'] or 0:>8.3f} {kind['wait_p95'] or 0:>8.3f} "
+                    f"{kind['wait_max'] or 0:>8.3f}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
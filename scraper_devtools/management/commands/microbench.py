@@ -0,0 +1,33 @@
+import json
+from django.core.management.base import BaseCommand
+from scraper_devtools.microbench import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Time one hot path against the approach it replaced. Writes to the configured database, use a development one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=list(BENCHMARKS))
+        parser.add_argument('--option', '-O', action='append', default=[], metavar='NAME=VALUE',
+                            help="Benchmark keyword argument, e.g. -O videos=20000 or -O file_format=ndjson")
+        parser.add_argument('--output', '-o', help="Write the JSON report here")
+
+    def handle(self, *args, **options):
+        kwargs = {}
+        for option in options['option']:
+            name, _, value = option.partition('=')
+            kwargs[name] = int(value) if value.isdigit() else value
+
+        report = BENCHMARKS[options['benchmark']](**kwargs)
+        settings = {key: value for key, value in report.items() if key not in ('benchmark', 'results')}
+        self.stdout.write(f"{report['benchmark']}: " + ', '.join(f"{key}={value}" for key, value in settings.items()))
+
+        columns = list(report['results'][0])
+        self.stdout.write(' '.join(f"{column:>18}" for column in columns))
+        for result in report['results']:
+            self.stdout.write(' '.join(f"{str(result[column]):>18}" for column in columns))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
@@ -0,0 +1,55 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from scraper_devtools.benchmark import MODE_OPTIONS, Fixtures
+from scraper_devtools.soak import run_soak
+
+
+class Command(BaseCommand):
+    help = "Scrape the benchmark fixtures over and over and check the database connection count stays bounded"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--modes', nargs='+', choices=list(MODE_OPTIONS), default=['thread', 'async', 'distributed'])
+        parser.add_argument('--videos', type=int, default=50, help="Videos in generated fixtures, and videos scraped per run")
+        parser.add_argument('--latency', type=float, default=0.01, help="Seconds the fake server waits before each response")
+        parser.add_argument('--error-rate', type=float, default=0.1,
+                            help="Fraction of requests throttled at random, failed videos are written from worker threads")
+        parser.add_argument('--sample-interval', type=float, default=0.5, help="Seconds between connection counts")
+        parser.add_argument('--task-options', type=json.loads, default=None,
+                            help='Extra scrape_youtube_channel kwargs as JSON, e.g. \'{"concurrency": 20}\'')
+        parser.add_argument('--output', '-o', help="Write the JSON report here")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("The soak test counts connections in pg_stat_activity and needs PostgreSQL")
+
+        report = run_soak(
+            Fixtures.generate(options['videos']),
+            rounds=options['rounds'],
+            modes=options['modes'],
+            sample_interval=options['sample_interval'],
+            max_videos=options['videos'],
+            latency=options['latency'],
+            jitter=0.0,
+            error_rate=options['error_rate'],
+            task_options=options['task_options'],
+        )
+
+        self.stdout.write(f"Connections before the soak: {report['baseline']}")
+        self.stdout.write(f"{'round':>5} {'seconds':>8} {'videos':>7} {'peak':>5} {'end':>5}")
+        for result in report['rounds']:
+            self.stdout.write(
+                f"{result['round']:>5} {result['seconds']:>8.2f} {result['videos_scraped']:>7} "
+                f"{result['connections_peak']:>5} {result['connections_end']:>5}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        summary = f"Peak connections: {report['early_peak']} in the first rounds, {report['late_peak']} in the last"
+        if not report['bounded']:
+            raise CommandError(f"{summary}: the connection count keeps growing")
+        self.stdout.write(self.style.SUCCESS(f"{summary}: bounded"))
@@ -0,0 +1,276 @@
+"""
+Microbenchmarks for single hot paths, each comparing the current code with
+the approach it replaced. Run through `manage.py microbench <name>`.
+
+They write to the configured database under their own channel and delete
+it afterwards, so point them at a development database.
+"""
+import asyncio
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import parse_qs, urlparse
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.pagination import Cursor, LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from scraper.db import in_worker_thread
+from scraper.exports import EXPORT_FIELDS, aiter_export, export_queryset, iter_rows, stream_export
+from scraper.extractors import PooledExtractor, close_all_extractors, extractor
+from scraper.models import Channel, Video
+from scraper.pagination import VideoCursorPagination
+from scraper.tasks import build_video
+from scraper.writer import VideoWriter
+from .benchmark import FakeYouTubeIE, FakeYouTubeServer, Fixtures
+
+
+MICROBENCH_CHANNEL_ID = 'UCmicrobench000000000000'
+
+
+def bench_channel():
+    Channel.objects.filter(channel_id=MICROBENCH_CHANNEL_ID).delete()
+    return Channel.objects.create(
+        channel_id=MICROBENCH_CHANNEL_ID,
+        channel_url=f"https://www.youtube.com/channel/{MICROBENCH_CHANNEL_ID}",
+        title='Microbenchmark',
+    )
+
+
+def video_info(i):
+    """A parsed video as build_video() gets it from yt-dlp"""
+    upload_date = datetime(2024, 1, 1, tzinfo=dt_timezone.utc) - timedelta(hours=i)
+    return {
+        'id': f"mb{i:09d}",
+        'title': f"Microbenchmark video {i}",
+        'description': 'Generated by scraper_devtools.microbench ' * 20,
+        'duration': 60 + i % 3600,
+        'view_count': i * 17,
+        'like_count': i,
+        'comment_count': i // 10,
+        'upload_date': upload_date.strftime('%Y%m%d'),
+        'thumbnails': [{'url': f"https://i.ytimg.com/vi/mb{i:09d}/hqdefault.jpg", 'width': 480, 'height': 360}],
+    }
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def best_of(repeat, func, *args):
+    return min(timed(func, *args) for _ in range(repeat))
+
+
+def create_videos(channel, rows, per_day=1000, batch_size=10000):
+    """Bare rows for the read benchmarks, `per_day` uploads sharing each upload date"""
+    start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    for offset in range(0, rows, batch_size):
+        Video.objects.bulk_create(
+            Video(channel=channel, video_id=f"mb{i:09d}", title=f"Microbenchmark video {i}",
+                  view_count=i, duration=60 + i % 3600, upload_date=start - timedelta(days=i // per_day),
+                  video_url=f"https://www.youtube.com/watch?v=mb{i:09d}")
+            for i in range(offset, min(rows, offset + batch_size))
+        )
+
+
+def bench_writes(videos=5000, threads=4):
+    """
+    Store `videos` scraped videos from `threads` scraping threads.
+
+    'get_or_create' is the old per-video path: an exists() check, then
+    get_or_create in its own transaction, on the scraping thread.
+    'writer' hands the videos to a VideoWriter, which bulk upserts them
+    from its consumer thread in VIDEO_WRITE_BATCH_SIZE batches. SQLite
+    takes one writer at a time and fails the old path with more than one thread.
+    """
+    channel = bench_channel()
+    infos = [video_info(i) for i in range(videos)]
+
+    def get_or_create(info):
+        video = build_video(channel, info['id'], f"https://www.youtube.com/watch?v={info['id']}", info)
+        if Video.objects.filter(video_id=video.video_id).exists():
+            return
+        with transaction.atomic():
+            Video.objects.get_or_create(
+                video_id=video.video_id,
+                defaults={field.name: getattr(video, field.name) for field in Video._meta.concrete_fields
+                          if not field.primary_key and field.name != 'video_id'},
+            )
+
+    def old_path():
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(in_worker_thread(get_or_create), infos))
+
+    def new_path():
+        with VideoWriter('microbench') as writer, ThreadPoolExecutor(max_workers=threads) as executor:
+            add = lambda info: writer.add(
+                build_video(channel, info['id'], f"https://www.youtube.com/watch?v={info['id']}", info)
+            )
+            list(executor.map(add, infos))
+
+    results = []
+    try:
+        for variant, run in (('get_or_create', old_path), ('writer', new_path)):
+            Video.objects.filter(channel=channel).delete()
+            seconds = timed(run)
+            stored = Video.objects.filter(channel=channel).count()
+            results.append({
+                'variant': variant,
+                'seconds': round(seconds, 3),
+                'videos_per_second': round(stored / seconds, 1),
+                'stored': stored,
+            })
+    finally:
+        channel.delete()
+    return {'benchmark': 'writes', 'videos': videos, 'threads': threads, 'results': results}
+
+
+def bench_extraction(videos=200, threads=4):
+    """
+    Extract `videos` videos from the benchmark's fake YouTube server with no added latency.
+
+    'fresh' builds a YoutubeDL per video and closes it afterwards, as the
+    scraper did before instances were pooled; building one registers every
+    yt-dlp extractor. 'pooled' borrows instances from the process pool
+    through extractor(). The gap is the construction cost per video.
+    """
+    fixtures = Fixtures.generate(videos)
+    urls = [f"https://www.youtube.com/watch?v={video_id}" for video_id in fixtures.videos]
+
+    def fresh(url):
+        entry = PooledExtractor('video')
+        try:
+            entry.ydl.extract_info(url, download=False)
+        finally:
+            entry.close()
+
+    def pooled(url):
+        with extractor('video') as ydl:
+            ydl.extract_info(url, download=False)
+
+    results = []
+    overrides = {'YDL_EXTRA_EXTRACTORS': ['scraper_devtools.benchmark.FakeYouTubeIE']}
+    with FakeYouTubeServer(fixtures, latency=0.0, jitter=0.0) as server, override_settings(**overrides):
+        FakeYouTubeIE.server_url = server.url
+        close_all_extractors()
+        try:
+            for variant, extract in (('fresh', fresh), ('pooled', pooled)):
+                server.reset_counters()
+                with ThreadPoolExecutor(max_workers=threads) as executor:
+                    seconds = timed(lambda: list(executor.map(extract, urls)))
+                results.append({
+                    'variant': variant,
+                    'seconds': round(seconds, 3),
+                    'videos_per_second': round(len(urls) / seconds, 1),
+                    'requests': server.requests,
+                })
+        finally:
+            close_all_extractors()
+    return {'benchmark': 'extraction', 'videos': videos, 'threads': threads, 'results': results}
+
+
+def bench_pagination(rows=1000000, page_size=50, repeat=3):
+    """
+    Fetch one page of /api/videos/ at growing depths in a table of `rows` videos.
+
+    'offset' is DRF's LimitOffsetPagination, which counts the table and
+    skips `depth` rows on every page. 'keyset' is VideoCursorPagination,
+    which starts from the cursor's (upload_date, id) in the
+    video_upload_date_id index. Each timing is the best of `repeat`.
+    """
+    channel = bench_channel()
+    factory = APIRequestFactory()
+    queryset = Video.objects.filter(upload_date__isnull=False).order_by('-upload_date', '-id')
+    depths = [depth for depth in (0, 1000, 10000, 100000, 500000, rows - page_size) if 0 <= depth < rows]
+
+    def offset_page(depth):
+        request = Request(factory.get('/api/videos/', {'limit': page_size, 'offset': depth}))
+        return LimitOffsetPagination().paginate_queryset(queryset, request)
+
+    def keyset_page(cursor):
+        request = Request(factory.get('/api/videos/', {'page_size': page_size, **cursor}))
+        return VideoCursorPagination().paginate_queryset(queryset, request)
+
+    def cursor_at(depth):
+        if depth == 0:
+            return {}
+        last = queryset[depth - 1]
+        paginator = VideoCursorPagination()
+        paginator.base_url = 'http://testserver/api/videos/'
+        link = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=paginator.encode_position(last)))
+        return {'cursor': parse_qs(urlparse(link).query)['cursor'][0]}
+
+    results = []
+    try:
+        create_videos(channel, rows)
+        for depth in depths:
+            cursor = cursor_at(depth)
+            assert [video.pk for video in keyset_page(cursor)] == [video.pk for video in offset_page(depth)]
+            offset_ms = best_of(repeat, offset_page, depth) * 1000
+            keyset_ms = best_of(repeat, keyset_page, cursor) * 1000
+            results.append({
+                'depth': depth,
+                'offset_ms': round(offset_ms, 2),
+                'keyset_ms': round(keyset_ms, 2),
+                'speedup': round(offset_ms / keyset_ms, 1),
+            })
+    finally:
+        channel.delete()
+    return {'benchmark': 'pagination', 'rows': rows, 'page_size': page_size, 'results': results}
+
+
+def measure_peak(func, *args):
+    """Seconds and peak Python heap in MB while func runs"""
+    tracemalloc.start()
+    try:
+        seconds = timed(func, *args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / (1024 * 1024)
+
+
+def bench_export(rows=1000000, file_format='csv'):
+    """
+    Export a channel of `rows` videos and track the peak Python heap.
+
+    'buffered' loads every row and renders the whole file before sending,
+    like a plain HttpResponse would. 'streaming' is the WSGI path: rows
+    through a server-side cursor and bytes out as they are rendered.
+    'asgi' adds aiter_export(), the blocks the ASGI server is handed.
+    """
+    channel = bench_channel()
+
+    def buffered():
+        rows = list(export_queryset(channel=channel.pk).values_list(*EXPORT_FIELDS))
+        return len(b''.join(stream_export(file_format, rows)))
+
+    def streaming():
+        return sum(len(chunk) for chunk in stream_export(file_format, iter_rows(export_queryset(channel=channel.pk))))
+
+    async def consume_asgi():
+        size = 0
+        async for block in aiter_export(stream_export(file_format, iter_rows(export_queryset(channel=channel.pk)))):
+            size += len(block)
+        return size
+
+    results = []
+    try:
+        create_videos(channel, rows)
+        for variant, run in (('buffered', buffered), ('streaming', streaming), ('asgi', lambda: asyncio.run(consume_asgi()))):
+            seconds, peak_mb = measure_peak(run)
+            results.append({'variant': variant, 'seconds': round(seconds, 2), 'peak_heap_mb': round(peak_mb, 1)})
+    finally:
+        channel.delete()
+    return {'benchmark': 'export', 'rows': rows, 'format': file_format, 'results': results}
+
+
+BENCHMARKS = {
+    'writes': bench_writes,
+    'extraction': bench_extraction,
+    'pagination': bench_pagination,
+    'export': bench_export,
+}
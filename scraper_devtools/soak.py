@@ -0,0 +1,79 @@
+import threading
+import time
+from django.db import connection
+from scraper.db import release_connections
+from .benchmark import run_benchmark
+
+
+def connection_count():
+    """Connections the server holds open to this database, across every client"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+        return cursor.fetchone()[0]
+
+
+class ConnectionSampler:
+    """Samples connection_count() on a background thread, which holds one connection of its own"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                self.samples.append(connection_count())
+                self._stop.wait(self.interval)
+        finally:
+            release_connections()
+
+    def take(self):
+        """Samples since the last call"""
+        samples, self.samples = self.samples, []
+        return samples
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_soak(fixtures, rounds=20, modes=('thread', 'async', 'distributed'), sample_interval=0.5, **benchmark_options):
+    """
+    Run the benchmark scrape `rounds` times over and track the database's connection count.
+
+    Leaked connections pile up from round to round, so the count is
+    bounded when the peak of the later rounds is no higher than the peak
+    of the first ones. Needs PostgreSQL.
+    """
+    baseline = connection_count()
+    release_connections()
+    results = []
+    with ConnectionSampler(sample_interval) as sampler:
+        for round_number in range(1, rounds + 1):
+            start = time.perf_counter()
+            report = run_benchmark(fixtures, modes=modes, **benchmark_options)
+            samples = sampler.take() or [connection_count()]
+            results.append({
+                'round': round_number,
+                'seconds': round(time.perf_counter() - start, 2),
+                'videos_scraped': sum(result['videos_scraped'] for result in report['results']),
+                'connections_peak': max(samples),
+                'connections_end': samples[-1],
+            })
+
+    half = max(1, len(results) // 2)
+    early_peak = max(result['connections_peak'] for result in results[:half])
+    late_peak = max(result['connections_peak'] for result in results[half:]) if results[half:] else early_peak
+    return {
+        'baseline': baseline,
+        'early_peak': early_peak,
+        'late_peak': late_peak,
+        'bounded': late_peak <= early_peak,
+        'rounds': results,
+    }
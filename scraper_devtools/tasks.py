@@ -0,0 +1,10 @@
+import time
+from celery import shared_task
+
+
+@shared_task
+def queue_latency_probe(sent_at, seconds=0.0):
+    """Stand-in task for the queue load test (scraper_devtools.loadtest): returns how long it waited in the queue, then sleeps"""
+    waited = time.time() - sent_at
+    time.sleep(seconds)
+    return waited
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -31,6 +32,7 @@ ALLOWED_HOSTS = ["*"]
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver, needed to stream task progress events
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -43,6 +45,12 @@ INSTALLED_APPS = [
     'drf_spectacular',
 ]
 
+# Benchmark, soak and queue load test harnesses (scraper_devtools), with their management commands
+# and the queue_latency_probe task. Off in production; the load test needs it on for the workers too.
+SCRAPER_DEV_TOOLS = config('SCRAPER_DEV_TOOLS', default=False, cast=bool)
+if SCRAPER_DEV_TOOLS:
+    INSTALLED_APPS.append('scraper_devtools')
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -72,6 +80,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'youtube_scraper.wsgi.application'
+ASGI_APPLICATION = 'youtube_scraper.asgi.application'
 
 
 # Database
@@ -85,17 +94,42 @@ WSGI_APPLICATION = 'youtube_scraper.wsgi.application'
 # }
 
 
+# Connection management, from the environment. DB_POOL_MODE is one of:
+# - 'pool': a psycopg 3 pool per process, DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE connections shared by every
+#   thread (or green thread) of the process, waiting up to DB_POOL_TIMEOUT seconds when all are in use
+# - 'persistent': a connection per thread, kept for DB_CONN_MAX_AGE seconds
+# - 'pgbouncer': DB_HOST is a PgBouncer in transaction mode, which does the pooling; a connection per
+#   request or task and no server-side cursors
+DB_POOL_MODE = config('DB_POOL_MODE', default='pool')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'youtube_scraper_db',
-        'USER': 'youtube_scraper',
-        'PASSWORD': 'youtube_scraper',
-        'HOST': 'db',
-        'PORT': '5432',
+        'NAME': config('DB_NAME', default='youtube_scraper_db'),
+        'USER': config('DB_USER', default='youtube_scraper'),
+        'PASSWORD': config('DB_PASSWORD', default='youtube_scraper'),
+        'HOST': config('DB_HOST', default='db'),
+        'PORT': config('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int) if DB_POOL_MODE == 'persistent' else 0,
+        # Check a reused or pooled connection still works before handing it out
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'pgbouncer',
+        'OPTIONS': {
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+        },
     }
 }
 
+if DB_POOL_MODE == 'pool':
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=30.0, cast=float),
+        # Idle connections above min_size close after max_idle seconds, all are replaced after max_lifetime
+        'max_idle': config('DB_POOL_MAX_IDLE', default=300.0, cast=float),
+        'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=1800.0, cast=float),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,6 +184,9 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Redis used by the scraper itself (locks, caches), the broker instance by default
+SCRAPER_REDIS_URL = CELERY_BROKER_URL
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -178,3 +215,191 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
+
+
+# Scraper settings
+# Scraped videos are buffered and upserted in batches by scraper.writer.VideoWriter
+VIDEO_WRITE_BATCH_SIZE = 100
+VIDEO_WRITE_FLUSH_INTERVAL = 2.0  # seconds
+
+# Each worker process pools YoutubeDL instances per extraction profile (scraper.extractors),
+# rebuilt after YDL_POOL_MAX_USES uses; at most YDL_POOL_MAX_IDLE idle ones are kept per profile
+YDL_POOL_MAX_USES = 50
+YDL_POOL_MAX_IDLE = 32
+
+# Dotted paths of yt-dlp InfoExtractor classes tried before the built-in ones (the scraper_devtools benchmark uses this)
+YDL_EXTRA_EXTRACTORS = []
+
+# Scrape video metadata without stream formats or player JS, falling back to a full extraction for missing fields
+VIDEO_METADATA_FAST_PATH = True
+
+# Video scraping pool: worker threads
+SCRAPE_CONCURRENCY = 5
+
+# Adaptive rate limiting (scraper.ratelimit): one AIMD bucket per egress, shared by all workers through
+# Redis. Successes add about RATE_LIMIT_INCREASE requests/sec per second; a 429, 503 or bot check
+# multiplies the rate by RATE_LIMIT_DECREASE, at most once per RATE_LIMIT_COOLDOWN seconds. Cache hits
+# make no request and count as neither.
+RATE_LIMIT_INITIAL = 1.0
+RATE_LIMIT_MIN = 0.1
+RATE_LIMIT_MAX = 20.0
+RATE_LIMIT_BURST = 5
+RATE_LIMIT_INCREASE = 0.1
+RATE_LIMIT_DECREASE = 0.5
+RATE_LIMIT_COOLDOWN = 5.0
+RATE_LIMIT_KEY_TTL = 24 * 60 * 60
+# While Redis is down each process limits on its own bucket, trying Redis again this often (seconds)
+RATE_LIMIT_REDIS_RETRY = 30.0
+# Names the bucket for requests made without a proxy; workers behind different IPs should differ
+RATE_LIMIT_EGRESS = 'direct'
+
+# Proxy pool (scraper.proxies) over the active Proxy rows; with none, requests go out directly.
+# Health is an EWMA with weight PROXY_HEALTH_ALPHA; PROXY_QUARANTINE_AFTER failures in a row bench a
+# proxy for PROXY_QUARANTINE_SECONDS, doubling on each repeat up to PROXY_QUARANTINE_MAX_SECONDS.
+PROXY_RELOAD_INTERVAL = 30
+PROXY_DEFAULT_LATENCY = 1.0
+PROXY_HEALTH_ALPHA = 0.2
+PROXY_HEALTH_TTL = 7 * 24 * 60 * 60
+PROXY_QUARANTINE_AFTER = 3
+PROXY_QUARANTINE_SECONDS = 60
+PROXY_QUARANTINE_MAX_SECONDS = 60 * 60
+PROXY_ASSIGNMENT_TTL = 2 * 60 * 60  # How long a task keeps its proxy
+PROXY_LEASE_TTL = 5 * 60  # A crashed request's slot frees itself after this
+PROXY_LEASE_WAIT = 30  # Seconds to wait for a slot when every proxy is full
+# When every proxy is quarantined, requests wait up to PROXY_QUARANTINE_WAIT seconds for the first one
+# back and then fail. Going out directly instead exposes the workers' own IPs, so it is opt-in.
+PROXY_QUARANTINE_WAIT = 90
+PROXY_DIRECT_FALLBACK = False
+
+# engine='async': videos in flight per task, and threads running the blocking yt-dlp extraction; a video
+# only takes a rate limit token once a thread is free for it, so the smaller of the two applies
+SCRAPE_ASYNC_CONCURRENCY = 100
+SCRAPE_ASYNC_EXECUTOR_WORKERS = 32
+
+# engine='distributed': videos per chunk subtask, and the queue chunks and their chord callback go to
+SCRAPE_CHUNK_SIZE = 25
+SCRAPE_CHUNK_QUEUE = 'extraction'
+
+# Queue for the full extractions a listing-tier scrape asks for with backfill
+LISTING_DETAIL_QUEUE = 'extraction'
+
+# incremental=True: uploads checked against the database per query, and how many stored videos in a row end the scan
+INCREMENTAL_PAGE_SIZE = 30
+INCREMENTAL_KNOWN_RUN = 5
+
+# Stats refresh (scraper.refresh): a beat-driven cycle every STATS_REFRESH_INTERVAL seconds that stops
+# after STATS_REFRESH_BUDGET of it. New uploads refresh every MIN_INTERVAL, doubling per HALF_LIFE of age.
+STATS_REFRESH_INTERVAL = 600
+STATS_REFRESH_BUDGET = 0.8
+STATS_REFRESH_BATCH_SIZE = 100
+STATS_REFRESH_CONCURRENCY = 5
+STATS_REFRESH_RATE = 1.0
+STATS_REFRESH_BURST = 5
+STATS_REFRESH_MIN_INTERVAL = 60 * 60
+STATS_REFRESH_HALF_LIFE = 7 * 24 * 60 * 60
+STATS_REFRESH_MAX_INTERVAL = 30 * 24 * 60 * 60
+
+# Batch scheduler (scraper.scheduler): channel scrapes running at once, interactive ones included,
+# seconds between beat-driven passes, and the shortest gap between passes kicked by finishing tasks
+SCHEDULER_MAX_CONCURRENT_CHANNELS = 20
+SCHEDULER_INTERVAL = 10
+SCHEDULER_KICK_DEBOUNCE = 1.0
+# Channels already being scraped one pass may step over before leaving the remaining slots empty
+SCHEDULER_MAX_BLOCKED_CHANNELS = 500
+# Largest batch POST /api/tasks/scrape_batch/ accepts, rows per bulk_create, and the queue dispatched scrapes go to
+SCHEDULER_MAX_BATCH_SIZE = 10000
+SCHEDULER_CREATE_BATCH_SIZE = 1000
+SCHEDULER_QUEUE = 'discovery'
+
+CELERY_BEAT_SCHEDULE = {
+    'refresh-video-stats': {
+        'task': 'scraper.tasks.refresh_video_stats',
+        'schedule': float(STATS_REFRESH_INTERVAL),
+    },
+    'schedule-scrapes': {
+        'task': 'scraper.tasks.schedule_scrapes',
+        'schedule': float(SCHEDULER_INTERVAL),
+    },
+}
+
+# Extraction cache (scraper.cache): 'redis' (SCRAPER_REDIS_URL), 'memory' (per process) or None to disable
+EXTRACTION_CACHE_BACKEND = 'redis'
+EXTRACTION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+EXTRACTION_CACHE_TTLS = {
+    'channel': 6 * 60 * 60,
+    'playlist': 15 * 60,
+    'video': 60 * 60,
+}
+
+# How long a channel stays claimed by its scrape if the task never releases it (crashed worker)
+SCRAPE_INFLIGHT_TTL = 2 * 60 * 60
+
+# Videos that fail transiently are retried one by one on VIDEO_RETRY_QUEUE, backing off exponentially
+# (with jitter) from VIDEO_RETRY_BASE_DELAY up to VIDEO_RETRY_MAX_DELAY seconds; permanent failures are tombstoned
+VIDEO_RETRY_QUEUE = 'extraction'
+VIDEO_RETRY_MAX_ATTEMPTS = 5
+VIDEO_RETRY_BASE_DELAY = 60
+VIDEO_RETRY_MAX_DELAY = 6 * 60 * 60
+
+# Per-task scrape checkpoints (scraper.checkpoints), kept this long so retries and redeliveries can resume
+SCRAPE_CHECKPOINT_TTL = 2 * 24 * 60 * 60
+
+# Scrape tasks ack late so a dead worker's task is redelivered; the broker waits this long for the ack
+# before handing the task to another worker, so keep it above the longest channel scrape
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': SCRAPE_INFLIGHT_TTL}
+
+# Worker topology: channel discovery, per-video extraction and DB persistence/refresh run on their own
+# queues, each consumed by its own worker (see docker-compose.yml), so long channel scrapes never hold up
+# short tasks. Anything unrouted goes to the default queue, which the discovery worker also consumes.
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+CELERY_TASK_ROUTES = {
+    'scraper.tasks.scrape_youtube_channel': {'queue': 'discovery'},
+    'scraper.tasks.scrape_multiple_channels': {'queue': 'discovery'},
+    'scraper.tasks.schedule_scrapes': {'queue': 'discovery'},
+    'scraper.tasks.scrape_video_chunk': {'queue': 'extraction'},
+    'scraper.tasks.retry_video_scrape': {'queue': 'extraction'},
+    'scraper.tasks.finalize_channel_scrape': {'queue': 'persistence'},
+    'scraper.tasks.refresh_video_stats': {'queue': 'persistence'},
+}
+
+# Reserve one task per pool slot only, so queued work goes to whichever worker frees up first instead of
+# piling up behind a busy one; with late acks a task is only removed from the queue once it has finished
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_ACKS_LATE = True
+
+# Time limits in seconds: the soft limit raises SoftTimeLimitExceeded in the task (a channel scrape then
+# retries and resumes from its checkpoint), the hard one kills it. Keep the hard limit under the broker
+# visibility_timeout, or the broker redelivers tasks that are still running.
+CELERY_TASK_SOFT_TIME_LIMIT = 60 * 60
+CELERY_TASK_TIME_LIMIT = CELERY_TASK_SOFT_TIME_LIMIT + 5 * 60
+CELERY_TASK_ANNOTATIONS = {
+    'scraper.tasks.scrape_video_chunk': {'soft_time_limit': 15 * 60, 'time_limit': 16 * 60},
+    'scraper.tasks.retry_video_scrape': {'soft_time_limit': 2 * 60, 'time_limit': 3 * 60},
+    'scraper.tasks.refresh_video_stats': {'soft_time_limit': STATS_REFRESH_INTERVAL, 'time_limit': STATS_REFRESH_INTERVAL + 60},
+    'scraper.tasks.schedule_scrapes': {'soft_time_limit': SCHEDULER_INTERVAL * 2, 'time_limit': SCHEDULER_INTERVAL * 3},
+}
+
+# Newest videos nested in GET /api/channels/{id}/
+CHANNEL_DETAIL_VIDEO_LIMIT = 50
+
+# Live task progress (scraper.progress): seconds between progress events, how long the latest
+# event is kept for late subscribers, the SSE keepalive interval, and the most tasks one
+# /api/tasks/events/ stream may watch
+PROGRESS_INTERVAL = 1.0
+PROGRESS_TTL = 24 * 60 * 60
+PROGRESS_KEEPALIVE = 15.0
+PROGRESS_MAX_STREAM_TASKS = 100
+
+# Bulk export (scraper.exports): rows per database fetch, and rows per Parquet row group
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_PARQUET_ROW_GROUP_SIZE = 50000
+# Bytes gathered per block sent to the client; each block is one hop to the sync thread under ASGI
+EXPORT_STREAM_BLOCK_SIZE = 64 * 1024
+
+# Metrics (scraper.metrics): port the Celery worker serves /metrics on (None to disable). Set the
+# PROMETHEUS_MULTIPROC_DIR environment variable so one endpoint covers every pool process.
+METRICS_WORKER_PORT = 9808
+
+# Opt-in profiling: when set, tasks running at least SCRAPE_PROFILE_MIN_SECONDS leave a cProfile dump here
+SCRAPE_PROFILE_DIR = None
+SCRAPE_PROFILE_MIN_SECONDS = 60